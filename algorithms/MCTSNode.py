@@ -1,8 +1,8 @@
-from typing import List, Optional
+from typing import List, Dict, Optional
 import random
 import math
 
-from utils import find_all_arithmetic_progressions
+from symmetry import canonical_aps
 
 
 class MCTSNode:
@@ -14,6 +14,7 @@ class MCTSNode:
         is_player_turn: bool,
         k: int,
         available_aps: Optional[List[set[int]]] = None,
+        aps_of: Optional[Dict[int, List[int]]] = None,
     ):
         """
         Tree node for Monte Carlo Tree Search.
@@ -27,6 +28,8 @@ class MCTSNode:
                if provided, a precomputed list of all arithmetic progressions (as sets)
                of length k over the union of available/current/opponent;
                otherwise it will be computed once here.
+        :param aps_of:    number -> indices of the progressions containing it,
+               shared along with available_aps.
         """
         self.available = available
         self.current = current
@@ -43,14 +46,24 @@ class MCTSNode:
         self.untried_moves = available[:]
         self.parent: Optional["MCTSNode"] = None
         self.move: Optional[int] = None  # The move that led to this node
+        self.rollout_length = 0  # Moves played by the last rollout from here
+        self.rollout_moves: List[int] = []  # and the moves it played, in order
+        self.terminal: Optional[bool] = None  # is_terminal(), once computed
 
         # Ensure available_aps is defined exactly once
         if available_aps is None:
             # Compute all k‐length progressions over the combined set of seen numbers
+            # (cached by canonical form: the board is the same every move)
             universe = set(available) | set(current) | set(opponent)
-            raw_aps = find_all_arithmetic_progressions(self.k, sorted(universe))
+            raw_aps = canonical_aps(self.k, universe)
             available_aps = [set(ap) for ap in raw_aps]
         self.available_aps = available_aps
+        if aps_of is None:
+            aps_of = {}
+            for i, ap in enumerate(available_aps):
+                for n in ap:
+                    aps_of.setdefault(n, []).append(i)
+        self.aps_of = aps_of
 
     def expand(self) -> "MCTSNode":
         """Add one child by taking an untried move."""
@@ -65,13 +78,15 @@ class MCTSNode:
         else:
             next_opponent.append(move)
 
-        child = MCTSNode(
+        child = pool.new(
+            type(self),
             available=next_available,
             current=next_current if self.is_player_turn else self.current,
             opponent=next_opponent if not self.is_player_turn else self.opponent,
             is_player_turn=not self.is_player_turn,
             k=self.k,
             available_aps=self.available_aps,
+            aps_of=self.aps_of,
         )
         child.parent = self
         child.move = move
@@ -99,12 +114,22 @@ class MCTSNode:
         return random.choice(available)
 
     def is_terminal(self) -> bool:
-        """Game over if no moves remain or someone has a progression."""
-        return (
-            not self.available
-            or self.has_ap(self.current)
-            or self.has_ap(self.opponent)
-        )
+        """
+        Game over if no moves remain, someone has a progression or no
+        progression is left that either player can complete.
+        """
+        if self.terminal is None:
+            current, opponent = set(self.current), set(self.opponent)
+            self.terminal = (
+                not self.available
+                or self.has_ap(self.current)
+                or self.has_ap(self.opponent)
+                or all(
+                    not ap.isdisjoint(current) and not ap.isdisjoint(opponent)
+                    for ap in self.available_aps
+                )
+            )
+        return self.terminal
 
     def has_ap(self, seq: List[int]) -> bool:
         """Check if seq contains any of the precomputed APs."""
@@ -116,24 +141,52 @@ class MCTSNode:
         Simulate a game to completion by random play.
         Returns 1 for a win by the starting player,
                 0 for a loss, and 0.5 for a draw.
+
+        Like Game, it counts the numbers each player holds in every
+        progression and how many progressions each can still complete, so
+        a move costs the progressions through it and the rollout stops as
+        a draw as soon as neither player can complete one.
         """
-        current = self.current[:]
-        opponent = self.opponent[:]
+        k = self.k
+        aps_of = self.aps_of
+        mine = [0] * len(self.available_aps)  # numbers of "current" per AP
+        theirs = [0] * len(self.available_aps)
+        for n in self.current:
+            for i in aps_of.get(n, ()):
+                mine[i] += 1
+        for n in self.opponent:
+            for i in aps_of.get(n, ()):
+                theirs[i] += 1
+        played = self.rollout_moves = []
+        self.rollout_length = 0
+        # Already decided (a terminal node).
+        if k in mine:
+            return 1.0
+        if k in theirs:
+            return 0.0
+        # Progressions each player can still complete.
+        live_mine = theirs.count(0)
+        live_theirs = mine.count(0)
+
         available = self.available[:]
         turn = self.is_player_turn
-
-        while available:
+        while available and (live_mine or live_theirs):
             move = self.rollout_policy(available)
             available.remove(move)
-            if turn:
-                current.append(move)
-                if self.has_ap(current):
-                    return 1.0
-            else:
-                opponent.append(move)
-                if self.has_ap(opponent):
-                    return 0.0
+            played.append(move)
+            own = mine if turn else theirs
+            for i in aps_of.get(move, ()):
+                own[i] += 1
+                if own[i] == k:
+                    self.rollout_length = len(played)
+                    return 1.0 if turn else 0.0
+                if own[i] == 1:
+                    if turn:
+                        live_theirs -= 1
+                    else:
+                        live_mine -= 1
             turn = not turn
+        self.rollout_length = len(played)
         return 0.5
 
     def backpropagate(self, result: float) -> None:
@@ -142,3 +195,244 @@ class MCTSNode:
         self.wins += result
         if self.parent:
             self.parent.backpropagate(result)
+
+
+class NodePool:
+    """
+    Free lists, per node class, of the nodes prune() cut from search trees.
+    expand() re-initialises one of them instead of allocating a new node.
+    At most capacity nodes per class are kept; the rest are left to the
+    garbage collector.
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.free: Dict[type, List[MCTSNode]] = {}
+
+    def new(self, cls: type, **kwargs) -> MCTSNode:
+        try:
+            node = self.free[cls].pop()
+        except (KeyError, IndexError):
+            return cls(**kwargs)
+        node.__init__(**kwargs)
+        return node
+
+    def release(self, node: MCTSNode) -> int:
+        """Frees node and its subtree. Returns the number of nodes freed."""
+        freed = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children)
+            # Drop the references so freed nodes do not keep each other alive.
+            node.children = []
+            node.parent = None
+            free = self.free.setdefault(type(node), [])
+            if len(free) < self.capacity:
+                free.append(node)
+            freed += 1
+        return freed
+
+
+pool = NodePool()
+
+
+def count_nodes(root: MCTSNode) -> int:
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        stack.extend(node.children)
+        count += 1
+    return count
+
+
+def prune(root: MCTSNode, size: int, target: int) -> int:
+    """
+    Cuts the least-visited subtrees of a tree of size nodes until at most
+    target are left, or only root and its children. A cut node's move goes
+    back to its parent's untried moves, to be expanded afresh if selection
+    comes back to it, and its nodes go to the pool. Returns the new size.
+    """
+    candidates = []
+    stack = list(root.children)
+    while stack:
+        node = stack.pop()
+        candidates.extend(node.children)
+        stack.extend(node.children)
+    candidates.sort(key=lambda node: node.visits)
+    for node in candidates:
+        if size <= target:
+            break
+        parent = node.parent
+        if parent is None:  # freed along with an ancestor
+            continue
+        parent.children.remove(node)
+        parent.untried_moves.append(node.move)
+        size -= pool.release(node)
+    return size
+
+
+class RAVENode(MCTSNode):
+    """
+    MCTS node with RAVE (rapid action value estimation).
+
+    The outcome only depends on the sets of numbers the players end up
+    holding, not on the order they were taken in, so every number a player
+    takes later in a simulation is credited to that player's move at this
+    node as if it had been played first ("all moves as first", AMAF).
+    Selection blends the AMAF value with the node's own value with weight
+    beta = sqrt(k / (3 N + k)), N being this node's visits and k
+    rave_equivalence, so AMAF dominates while a node has few visits and
+    fades out as real statistics accumulate.
+
+    Unlike MCTSNode.best_child, values are taken from the point of view of
+    the player to move at this node.
+    """
+
+    rave_equivalence = 300
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.amaf_visits: Dict[int, int] = {}
+        self.amaf_wins: Dict[int, float] = {}
+
+    def best_child(self, c_param: float = 0.5) -> "RAVENode":
+        beta = math.sqrt(
+            self.rave_equivalence / (3 * self.visits + self.rave_equivalence)
+        )
+        log_visits = math.log(self.visits)
+
+        def value(child: "RAVENode") -> float:
+            q = child.wins / child.visits
+            amaf_n = self.amaf_visits.get(child.move, 0)
+            if amaf_n:
+                q = (1 - beta) * q + beta * self.amaf_wins[child.move] / amaf_n
+            if not self.is_player_turn:
+                q = 1 - q
+            return q + c_param * math.sqrt(log_visits / child.visits)
+
+        return max(self.children, key=value)
+
+    def backpropagate(self, result: float) -> None:
+        """
+        Propagates the result up the tree and credits AMAF statistics:
+        at every node, to each move its player to move made later in the
+        simulation, in the tree or in the rollout.
+        """
+        # Moves made after the current node, by whether "current" made them.
+        by_current = set(self.rollout_moves[0::2])
+        by_opponent = set(self.rollout_moves[1::2])
+        if not self.is_player_turn:
+            by_current, by_opponent = by_opponent, by_current
+        node = self
+        while node is not None:
+            node.visits += 1
+            node.wins += result
+            for move in by_current if node.is_player_turn else by_opponent:
+                node.amaf_visits[move] = node.amaf_visits.get(move, 0) + 1
+                node.amaf_wins[move] = node.amaf_wins.get(move, 0.0) + result
+            if node.parent is not None:
+                (by_current if node.parent.is_player_turn else by_opponent).add(
+                    node.move
+                )
+            node = node.parent
+
+
+class LearnedNode(MCTSNode):
+    """
+    MCTS node guided by a policy/value model (see evaluator.py), as in
+    AlphaZero. A node is evaluated once, when the search first reaches it:
+    the model's value of the position stands in for the random rollout,
+    and its move probabilities P become the priors of PUCT selection,
+
+        Q + c_puct * P * sqrt(N) / (1 + n),
+
+    taken over every move, tried or not, so the search goes deep along the
+    moves the model likes instead of trying every move once first. An
+    untried move is scored with its parent's value for Q. rollout_weight
+    mixes in the result of a random rollout.
+
+    evaluator is shared down the tree; its evaluate(mover, opponent)
+    returns (probability of each free number, value for the mover). Like
+    RAVENode, values are taken from the point of view of the player to
+    move at this node.
+    """
+
+    c_puct = 1.5
+    rollout_weight = 0.0
+
+    def __init__(self, *args, evaluator=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evaluator = evaluator
+        self.priors: Optional[Dict[int, float]] = None
+        # select()'s pick, a child or an untried move, and the state it was
+        # made in: it holds until the node's statistics or moves change.
+        self.selected = None
+        self.selected_at = None
+
+    def evaluate(self) -> float:
+        """Stores the priors of the node's moves; returns the model's value
+        for the root player."""
+        if self.is_player_turn:
+            mover, opponent = self.current, self.opponent
+        else:
+            mover, opponent = self.opponent, self.current
+        self.priors, value = self.evaluator.evaluate(mover, opponent)
+        return value if self.is_player_turn else 1 - value
+
+    def select(self):
+        """The child, or untried move, with the highest PUCT score."""
+        state = (self.visits, len(self.children), len(self.untried_moves))
+        if self.selected_at == state:
+            return self.selected
+        if self.priors is None:
+            self.evaluate()
+        priors = self.priors
+        mean = self.wins / self.visits if self.visits else 0.5
+        if not self.is_player_turn:
+            mean = 1 - mean
+        scale = self.c_puct * math.sqrt(max(self.visits, 1))
+        best, best_score = None, -math.inf
+        for child in self.children:
+            q = child.wins / child.visits
+            if not self.is_player_turn:
+                q = 1 - q
+            score = q + scale * priors.get(child.move, 0.0) / (1 + child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        for move in self.untried_moves:
+            score = mean + scale * priors.get(move, 0.0)
+            if score > best_score:
+                best, best_score = move, score
+        self.selected, self.selected_at = best, state
+        return best
+
+    def is_fully_expanded(self) -> bool:
+        """True if selection should go on into an existing child."""
+        return not self.untried_moves or isinstance(self.select(), MCTSNode)
+
+    def best_child(self, c_param: float = 0.0) -> "LearnedNode":
+        return self.select()
+
+    def expand(self) -> "LearnedNode":
+        move = self.select()
+        # MCTSNode.expand takes the last untried move.
+        self.untried_moves.remove(move)
+        self.untried_moves.append(move)
+        child = super().expand()
+        child.evaluator = self.evaluator
+        return child
+
+    def rollout(self) -> float:
+        if self.is_terminal():
+            return super().rollout()
+        value = self.evaluate()
+        if self.rollout_weight:
+            value = (1 - self.rollout_weight) * value + (
+                self.rollout_weight * super().rollout()
+            )
+        else:
+            self.rollout_length = 0
+            self.rollout_moves = []
+        return value
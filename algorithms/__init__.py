@@ -1,8 +1,54 @@
-registry = {}
+from tracing import traced
+from .loader import Registry, discover
+
+# Built-in algorithms: name -> (module, description). Listing the registry
+# (e.g. the settings screen) imports nothing; an implementation is imported
+# when it is first looked up. New built-in modules must also be listed in
+# hiddenimports in szemeredi_game.spec, as nothing imports them statically.
+BUILTIN = {
+    "random": ("algorithms.algorithms", "Uniformly random move."),
+    "heuristic": ("algorithms.algorithms", "Number near the median and close to its own numbers."),
+    "min": ("algorithms.algorithms", "Smallest available number."),
+    "heuristic_fast": ("algorithms.algorithms", "Completes or blocks an AP, else the number on most 3-term APs."),
+    "overlap_max": ("algorithms.algorithms", "Extends its most advanced open AP, or blocks the opponent's."),
+    "mcts_cached": ("algorithms.algorithms", "MCTS (1000 simulations) keeping its tree between moves."),
+    "mcts": ("algorithms.algorithms", "MCTS with 1000 simulations from scratch every move."),
+    "mcts_rave": ("algorithms.algorithms", "MCTS with RAVE (all-moves-as-first) statistics, 250 simulations."),
+    "mcts_learned": ("algorithms.algorithms", "MCTS with a learned policy/value model (PUCT), 100 simulations."),
+    "potential": ("algorithms.potential", "Erdos-Selfridge: most own potential gained plus opponent potential destroyed."),
+}
+BUILTIN_PONDER = {
+    "mcts_cached": "algorithms.algorithms",
+}
+
+_discovered = False
+def _discover():
+    global _discovered
+    if not _discovered:
+        _discovered = True
+        discover(registry, ponder_registry)
+
+# Every registered strategy shows up as a span when tracing is on.
+registry = Registry(_discover, wrap=lambda name, func: traced(f"choose_move {name}")(func))
+for _name, (_module, _description) in BUILTIN.items():
+    registry.declare(_name, _module, _description)
+
 def register_algorithm(name):
     def decorator(func):
-        registry[name.lower()] = func
+        registry[name] = func
         return func
     return decorator
 
-from . import algorithms
+# Algorithms that can keep searching while the opponent thinks register a
+# ponder function with the same arguments as their choose_move (position from
+# their own point of view). It runs until the current SearchControl is
+# cancelled and prepares state the next choose_move call reuses.
+ponder_registry = Registry(_discover)
+for _name, _module in BUILTIN_PONDER.items():
+    ponder_registry.declare(_name, _module)
+
+def register_ponder(name):
+    def decorator(func):
+        ponder_registry[name] = func
+        return func
+    return decorator
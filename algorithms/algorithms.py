@@ -1,10 +1,16 @@
-from typing import List
-from . import register_algorithm
+from typing import List, Dict, Any, Optional
+from . import register_algorithm, register_ponder
+from .control import current_control, report_stats
+import os
 import random
+import time
 import statistics
 from itertools import combinations
-from utils import find_all_arithmetic_progressions
-from algorithms.MCTSNode import MCTSNode
+from symmetry import canonical_aps
+from algorithms.MCTSNode import MCTSNode, RAVENode, LearnedNode, count_nodes, prune
+from tracing import span
+import book
+import solved
 
 
 @register_algorithm("random")
@@ -113,7 +119,7 @@ def choose_move(
 ) -> int:
     # Build the universe of numbers and all length‐k APs
     universe = sorted(set(available) | set(own_moves) | set(opp_moves))
-    all_aps = [set(ap) for ap in find_all_arithmetic_progressions(k, universe)]
+    all_aps = [set(ap) for ap in canonical_aps(k, universe)]
 
     # Filter to APs still possible for each side
     possible_self = [ap for ap in all_aps if not (ap & set(opp_moves))]
@@ -173,6 +179,124 @@ def compare(a: List[int], b: List[int]) -> bool:
     return True
 
 
+# Largest number of nodes a search tree may hold (about 1.2 KB each); when
+# a search reaches it, the least-visited subtrees are pruned down to
+# PRUNE_TO of it and the search goes on. 0 means no limit.
+NODE_BUDGET = int(os.environ.get("SZEMEREDI_NODE_BUDGET", 100000))
+PRUNE_TO = 0.75
+
+
+def run_simulations(root: MCTSNode, simulations: int) -> Dict[str, Any]:
+    """
+    Runs the four MCTS phases simulations times from root, or fewer if the
+    deadline of the current SearchControl passes or it is cancelled first.
+    Keeps the tree within NODE_BUDGET nodes. Returns statistics of the
+    search.
+    """
+    control = current_control()
+    deadline = control.deadline if control is not None else None
+    start = time.perf_counter()
+    depth_total = max_depth = rollout_total = terminal_hits = nodes = done = 0
+    # Every node was added by a simulation through root, so the tree has at
+    # most root.visits + 1 of them; count exactly only when that is too many.
+    size = root.visits + 1
+    if NODE_BUDGET and size > NODE_BUDGET:
+        size = count_nodes(root)
+    pruned = 0
+    for done in range(simulations):
+        if NODE_BUDGET and size > NODE_BUDGET:
+            with span("mcts.prune"):
+                new_size = prune(root, size, int(NODE_BUDGET * PRUNE_TO))
+            pruned += size - new_size
+            size = new_size
+        if control is not None:
+            control.simulations = done
+            # Always complete at least one simulation so the root has a child.
+            if done and (
+                control.cancelled
+                or (deadline is not None and time.perf_counter() >= deadline)
+            ):
+                break
+        node = root
+        depth = 0
+
+        # Selection
+        with span("mcts.select"):
+            while not node.is_terminal() and node.is_fully_expanded():
+                node = node.best_child()
+                depth += 1
+
+        # Expansion
+        with span("mcts.expand"):
+            if not node.is_terminal() and not node.is_fully_expanded():
+                node = node.expand()
+                depth += 1
+                nodes += 1
+                size += 1
+            else:
+                terminal_hits += 1
+
+        # Simulation
+        with span("mcts.rollout"):
+            result = node.rollout()
+
+        # Backpropagation
+        with span("mcts.backprop"):
+            node.backpropagate(result)
+
+        depth_total += depth
+        max_depth = max(max_depth, depth)
+        rollout_total += node.rollout_length
+    else:
+        done = simulations
+
+    elapsed = time.perf_counter() - start
+    return {
+        "simulations": done,
+        "time": elapsed,
+        "simulations_per_sec": done / elapsed if elapsed else 0.0,
+        "nodes_allocated": nodes,
+        "nodes_pruned": pruned,
+        "tree_size": size,
+        "max_depth": max_depth,
+        "avg_depth": depth_total / done if done else 0.0,
+        "avg_rollout_length": rollout_total / done if done else 0.0,
+        "terminal_hit_rate": terminal_hits / done if done else 0.0,
+    }
+
+
+def root_visits(root: MCTSNode) -> List[List[float]]:
+    """[move, visits, mean result] of every root child, most visited first."""
+    return [
+        [child.move, child.visits, child.wins / child.visits if child.visits else 0.0]
+        for child in sorted(root.children, key=lambda c: -c.visits)
+    ]
+
+
+def known_move(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+) -> Optional[int]:
+    """
+    The move for the position from the loaded opening book (see book.py)
+    or the solved-position store (see solved.py), reported as the move's
+    search statistics; None if neither knows the position.
+    """
+    entry = book.probe(available_moves, current_held, opponent_held, k)
+    if entry is not None:
+        move, visits, value = entry
+        report_stats(book.book_stats(visits, value))
+        return move
+    found = solved.solved_move(available_moves, current_held, opponent_held, k)
+    if found is not None:
+        move, stats = found
+        report_stats(stats)
+        return move
+    return None
+
+
 prev_root = None
 
 
@@ -183,8 +307,13 @@ def choose_move(
     opponent_held: List[int],
     k: int,
 ) -> int:
-    root = None
     global prev_root
+    move = known_move(available_moves, current_held, opponent_held, k)
+    if move is not None:
+        # The tree would not match the position the next time it is searched.
+        prev_root = None
+        return move
+    root = None
     if prev_root is not None:
         for child in prev_root.children:
             if compare(child.current, current_held) and compare(
@@ -193,25 +322,15 @@ def choose_move(
                 root = child
                 root.parent = None
                 break
+    reused_visits = root.visits if root else 0
     if not root:
         root = MCTSNode(available_moves, current_held, opponent_held, True, k)
 
-    for _ in range(1000):  # number of simulations
-        node = root
-
-        # Selection
-        while not node.is_terminal() and node.is_fully_expanded():
-            node = node.best_child()
-
-        # Expansion
-        if not node.is_terminal() and not node.is_fully_expanded():
-            node = node.expand()
-
-        # Simulation
-        result = node.rollout()
-
-        # Backpropagation
-        node.backpropagate(result)
+    stats = run_simulations(root, 1000)  # number of simulations
+    stats["root_visits"] = root_visits(root)
+    stats["reused"] = reused_visits > 0
+    stats["reused_visits"] = reused_visits
+    report_stats(stats)
 
     # Choose the move with the most visits
     best_child = max(root.children, key=lambda c: c.visits)
@@ -219,6 +338,36 @@ def choose_move(
     return best_child.move
 
 
+# Upper bound on simulations per ponder, so a human who never moves does not
+# grow the tree without limit.
+PONDER_SIMULATIONS = 200000
+
+
+@register_ponder("mcts_cached")
+def ponder(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+) -> Dict[str, Any]:
+    """
+    Searches the tree kept from the last move (prev_root, where it is the
+    opponent's turn) until cancelled. choose_move re-roots onto the
+    opponent's actual reply and keeps the statistics gathered here.
+    """
+    root = prev_root
+    if (
+        root is None
+        or not compare(root.current, current_held)
+        or not compare(root.opponent, opponent_held)
+        or root.is_terminal()
+    ):
+        return {}
+    # Detach from the previous tree so backpropagation stops here.
+    root.parent = None
+    return run_simulations(root, PONDER_SIMULATIONS)
+
+
 @register_algorithm("mcts")
 def choose_move(
     available_moves: List[int],
@@ -226,24 +375,62 @@ def choose_move(
     opponent_held: List[int],
     k: int,
 ) -> int:
+    move = known_move(available_moves, current_held, opponent_held, k)
+    if move is not None:
+        return move
     root = MCTSNode(available_moves, current_held, opponent_held, True, k)
 
-    for _ in range(1000):  # number of simulations
-        node = root
+    stats = run_simulations(root, 1000)  # number of simulations
+    stats["root_visits"] = root_visits(root)
+    report_stats(stats)
 
-        # Selection
-        while not node.is_terminal() and node.is_fully_expanded():
-            node = node.best_child()
+    # Choose the move with the most visits
+    best_child = max(root.children, key=lambda c: c.visits)
+    return best_child.move
 
-        # Expansion
-        if not node.is_terminal() and not node.is_fully_expanded():
-            node = node.expand()
 
-        # Simulation
-        result = node.rollout()
+@register_algorithm("mcts_rave")
+def choose_move(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+) -> int:
+    move = known_move(available_moves, current_held, opponent_held, k)
+    if move is not None:
+        return move
+    root = RAVENode(available_moves, current_held, opponent_held, True, k)
 
-        # Backpropagation
-        node.backpropagate(result)
+    stats = run_simulations(root, 250)  # number of simulations
+    stats["root_visits"] = root_visits(root)
+    report_stats(stats)
+
+    # Choose the move with the most visits
+    best_child = max(root.children, key=lambda c: c.visits)
+    return best_child.move
+
+
+@register_algorithm("mcts_learned")
+def choose_move(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+) -> int:
+    move = known_move(available_moves, current_held, opponent_held, k)
+    if move is not None:
+        return move
+    # Imported here: only this algorithm needs NumPy and the model.
+    import evaluator
+
+    root = LearnedNode(available_moves, current_held, opponent_held, True, k)
+    root.evaluator = evaluator.board_evaluator(
+        available_moves + current_held + opponent_held, root.available_aps, k
+    )
+
+    stats = run_simulations(root, 100)  # number of simulations
+    stats["root_visits"] = root_visits(root)
+    report_stats(stats)
 
     # Choose the move with the most visits
     best_child = max(root.children, key=lambda c: c.visits)
@@ -0,0 +1,50 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+_local = threading.local()
+
+
+class SearchControl:
+    """
+    Channel between a caller of choose_move and the algorithm.
+
+    The caller installs one with use_control() around a choose_move call;
+    search algorithms report their per-move statistics through
+    report_stats() and the caller reads them from .stats afterwards.
+    Algorithms that do not search simply leave .stats empty.
+    If deadline (a time.perf_counter() value) is set, searches return
+    their best move so far once it has passed; cancel() does the same from
+    another thread. While a search runs, .simulations counts its completed
+    simulations so that a caller on another thread can show progress.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.stats: Dict[str, Any] = {}
+        self.deadline = deadline
+        self.cancelled = False
+        self.simulations = 0
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+def current_control() -> Optional[SearchControl]:
+    """The control installed for the running choose_move call, if any."""
+    return getattr(_local, "control", None)
+
+
+@contextmanager
+def use_control(control: SearchControl):
+    previous = current_control()
+    _local.control = control
+    try:
+        yield control
+    finally:
+        _local.control = previous
+
+
+def report_stats(stats: Dict[str, Any]) -> None:
+    control = current_control()
+    if control is not None:
+        control.stats = stats
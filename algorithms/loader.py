@@ -0,0 +1,190 @@
+import os
+import sys
+import ast
+import importlib
+import importlib.util
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Callable, Optional, Tuple
+
+# Third-party packages register strategies under this entry point group,
+# e.g. in pyproject.toml:
+#   [project.entry-points."szemeredi.algorithms"]
+#   my_algo = "my_package.strategies:choose_move"
+# The entry name is the algorithm's name; the object is its choose_move (or a
+# module whose import registers it with @register_algorithm).
+ENTRY_POINT_GROUP = "szemeredi.algorithms"
+
+# Directory scanned for plugin files; every @register_algorithm("name") in a
+# .py file there becomes available under that name.
+PLUGIN_ENV = "SZEMEREDI_PLUGINS"
+PLUGIN_DIR = "plugins"
+
+
+class Registry(MutableMapping):
+    """
+    Name -> choose_move mapping that imports implementations on first use.
+
+    declare() records where an algorithm lives (a module name, a plugin
+    file path or an entry point) and a description, so that listing names
+    imports nothing. Looking an algorithm up imports its source, whose
+    decorators then store the function through __setitem__. Plugins and
+    entry points are discovered the first time the full set of names is
+    needed or a name is not declared. wrap(name, func), if given, is applied
+    to every function stored.
+    """
+
+    def __init__(
+        self,
+        discover: Optional[Callable[[], None]] = None,
+        wrap: Optional[Callable[[str, Callable], Callable]] = None,
+    ):
+        self._sources: Dict[str, object] = {}
+        self._descriptions: Dict[str, str] = {}
+        self._funcs: Dict[str, Callable] = {}
+        self._discover = discover
+        self._wrap = wrap
+
+    def declare(self, name: str, source: object, description: str = "") -> None:
+        name = name.lower()
+        self._sources.setdefault(name, source)
+        if description:
+            self._descriptions.setdefault(name, description)
+
+    def describe(self, name: str) -> str:
+        return self._descriptions.get(name.lower(), "")
+
+    def _discover_once(self) -> None:
+        discover, self._discover = self._discover, None
+        if discover is not None:
+            discover()
+
+    def _load(self, name: str) -> None:
+        source = self._sources[name]
+        if hasattr(source, "load"):  # an importlib.metadata.EntryPoint
+            obj = source.load()
+            if callable(obj) and name not in self._funcs:
+                self[name] = obj
+        elif source.endswith(".py"):
+            _import_file(source)
+        else:
+            importlib.import_module(source)
+
+    def __getitem__(self, name: str) -> Callable:
+        name = name.lower()
+        func = self._funcs.get(name)
+        if func is not None:
+            return func
+        if name not in self._sources:
+            self._discover_once()
+        if name not in self._sources:
+            raise KeyError(name)
+        self._load(name)
+        if name not in self._funcs:
+            raise KeyError(f"{name} was not registered by {self._sources[name]}")
+        return self._funcs[name]
+
+    def __setitem__(self, name: str, func: Callable) -> None:
+        name = name.lower()
+        self._sources.setdefault(name, getattr(func, "__module__", None))
+        self._funcs[name] = self._wrap(name, func) if self._wrap else func
+        doc = (getattr(func, "__doc__", None) or "").strip()
+        if doc:
+            self._descriptions.setdefault(name, doc.splitlines()[0])
+
+    def __delitem__(self, name: str) -> None:
+        name = name.lower()
+        del self._sources[name]
+        self._funcs.pop(name, None)
+
+    def __iter__(self) -> Iterator[str]:
+        self._discover_once()
+        return iter(list(self._sources))
+
+    def __len__(self) -> int:
+        self._discover_once()
+        return len(self._sources)
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        if name.lower() not in self._sources:
+            self._discover_once()
+        return name.lower() in self._sources
+
+
+_plugin_modules: Dict[str, object] = {}
+
+
+def _import_file(path: str) -> None:
+    """Imports a plugin file once, however many algorithms it defines."""
+    if path in _plugin_modules:
+        return
+    name = "szemeredi_plugin_" + os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    _plugin_modules[path] = module
+    spec.loader.exec_module(module)
+
+
+def scan_plugin(path: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Finds @register_algorithm("name") and @register_ponder("name")
+    decorators in a source file without importing it.
+    Returns {"algorithm" or "ponder" + ":" + name: (name, description)}.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    found = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for dec in node.decorator_list:
+            if not (
+                isinstance(dec, ast.Call)
+                and dec.args
+                and isinstance(dec.args[0], ast.Constant)
+                and isinstance(dec.args[0].value, str)
+            ):
+                continue
+            func = dec.func.attr if isinstance(dec.func, ast.Attribute) else None
+            if isinstance(dec.func, ast.Name):
+                func = dec.func.id
+            kind = {"register_algorithm": "algorithm", "register_ponder": "ponder"}
+            if func in kind:
+                name = dec.args[0].value.lower()
+                doc = (ast.get_docstring(node) or "").strip()
+                found[f"{kind[func]}:{name}"] = (
+                    name,
+                    doc.splitlines()[0] if doc else "",
+                )
+    return found
+
+
+def plugin_files() -> Iterator[str]:
+    directory = os.environ.get(PLUGIN_ENV, PLUGIN_DIR)
+    if not os.path.isdir(directory):
+        return
+    for fname in sorted(os.listdir(directory)):
+        if fname.endswith(".py") and not fname.startswith("_"):
+            yield os.path.abspath(os.path.join(directory, fname))
+
+
+def discover(algorithms: Registry, ponders: Registry) -> None:
+    """Declares the algorithms of the plugins directory and entry points."""
+    # Imported here: importlib.metadata alone costs tens of milliseconds.
+    from importlib import metadata
+
+    for path in plugin_files():
+        try:
+            found = scan_plugin(path)
+        except (OSError, SyntaxError) as e:
+            print(f"Skipping plugin {path}: {e}")
+            continue
+        for key, (name, description) in found.items():
+            target = algorithms if key.startswith("algorithm:") else ponders
+            target.declare(name, path, description)
+    if getattr(sys, "frozen", False):
+        # A PyInstaller build carries no package metadata to search.
+        return
+    for ep in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        algorithms.declare(ep.name, ep)
@@ -0,0 +1,118 @@
+from typing import List, Dict, Optional, Set, FrozenSet
+import random
+
+from . import register_algorithm
+from symmetry import canonical_aps
+
+
+class Potentials:
+    """
+    Erdős–Selfridge potentials of a board, kept up to date move by move.
+
+    A progression is live for a player while the other player holds none
+    of its numbers; a live progression with c of the player's numbers in
+    it weighs 2^-(k - c), in units of 2^-k here so that weights stay exact
+    integers (2^c). score[p][n] is the total weight of the progressions
+    live for player p through number n: what p gains by taking n (each of
+    those weights doubles) and, for the other player, what taking n
+    destroys. Taking a number only touches the progressions through it.
+
+    Players are colours 0 and 1, fixed by who holds which numbers, so the
+    same state serves both sides of a game.
+    """
+
+    def __init__(self, board: FrozenSet[int], k: int):
+        self.board = board
+        self.k = k
+        self.aps = [tuple(ap) for ap in canonical_aps(k, board)]
+        self.aps_of: Dict[int, List[int]] = {n: [] for n in board}
+        for i, ap in enumerate(self.aps):
+            for n in ap:
+                self.aps_of[n].append(i)
+        self.held: List[Set[int]] = [set(), set()]
+        self.count = [[0] * len(self.aps), [0] * len(self.aps)]
+        self.score: List[Dict[int, int]] = [
+            {n: len(self.aps_of[n]) for n in board},
+            {n: len(self.aps_of[n]) for n in board},
+        ]
+        # Numbers completing a live progression of each colour: number ->
+        # how many progressions it completes.
+        self.wins: List[Dict[int, int]] = [{}, {}]
+
+    def take(self, colour: int, n: int) -> None:
+        other = 1 - colour
+        own, opp = self.count[colour], self.count[other]
+        self.held[colour].add(n)
+        self.wins[0].pop(n, None)
+        self.wins[1].pop(n, None)
+        for i in self.aps_of[n]:
+            ap = self.aps[i]
+            if opp[i] == 0:
+                # Live for colour: its weight doubles.
+                gain = 1 << own[i]
+                for m in ap:
+                    self.score[colour][m] += gain
+                if own[i] == self.k - 2:
+                    for m in ap:
+                        if m != n and m not in self.held[colour]:
+                            self.wins[colour][m] = self.wins[colour].get(m, 0) + 1
+            if own[i] == 0:
+                # Was live for the other colour: destroyed.
+                loss = 1 << opp[i]
+                for m in ap:
+                    self.score[other][m] -= loss
+            own[i] += 1
+
+    def sync(self, current_held: List[int], opponent_held: List[int]) -> Optional[int]:
+        """
+        Applies the numbers taken since the last call. Returns the colour
+        of the player holding current_held, or None if the position does
+        not follow from the state (numbers were given back).
+        """
+        current, opponent = set(current_held), set(opponent_held)
+        for colour in (0, 1):
+            if self.held[colour] <= current and self.held[1 - colour] <= opponent:
+                for n in current - self.held[colour]:
+                    self.take(colour, n)
+                for n in opponent - self.held[1 - colour]:
+                    self.take(1 - colour, n)
+                return colour
+        return None
+
+
+_state: Optional[Potentials] = None
+
+
+@register_algorithm("potential")
+def choose_move(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+) -> int:
+    """
+    Completes a progression if it can, else blocks one the opponent is
+    about to complete, else takes the number with the largest own
+    potential gain plus opponent potential destroyed (Erdős–Selfridge).
+    """
+    global _state
+    if not available_moves:
+        return -1
+    board = (
+        frozenset(available_moves) | frozenset(current_held) | frozenset(opponent_held)
+    )
+    colour = None
+    if _state is not None and _state.board == board and _state.k == k:
+        colour = _state.sync(current_held, opponent_held)
+    if colour is None:
+        _state = Potentials(board, k)
+        colour = _state.sync(current_held, opponent_held)
+    state = _state
+
+    for wins in (state.wins[colour], state.wins[1 - colour]):
+        if wins:
+            return random.choice(list(wins))
+
+    own, opp = state.score[colour], state.score[1 - colour]
+    best_score = max(own[n] + opp[n] for n in available_moves)
+    return random.choice([n for n in available_moves if own[n] + opp[n] == best_score])
@@ -0,0 +1,421 @@
+import os
+import json
+import time
+import argparse
+import itertools
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+import numpy as np
+
+from corpus import load_corpus
+from benchmark import MOVES_DIR, STATS_DIR, new_results, save_move_log, save_results
+
+# Plays many games of one pairing at once: every array has a leading board
+# axis and a move is one vectorised step for all unfinished games. Board
+# numbers are kept sorted, so a number is a column index; progressions are
+# rows of column indices, padded to the largest count of the batch.
+
+
+# Memory the arrays of one batch may take; larger boards get smaller
+# batches (see batch_limit).
+BATCH_MEMORY_MB = 1024
+
+
+def batch_limit(
+    k: int, x: int, lower: int, bound: int, memory_mb: int = BATCH_MEMORY_MB
+) -> int:
+    """
+    Largest number of boards played at once within memory_mb. Per board,
+    random_boards holds 16 bytes per number of the range (random keys and
+    their order), enumerate_aps holds 4 bytes per number up to bound (its
+    column lookup) and about 16 + 12k bytes per pair of numbers of the
+    board, and the incidence matrix takes x bytes per progression; a random
+    board has about pairs * density^(k - 2) progressions.
+    """
+    span = bound - lower + 1
+    pairs = x * (x - 1) // 2
+    density = min(1.0, x / span)
+    per_board = (
+        16 * span
+        + 4 * (bound + 1)
+        + pairs * (16 + 12 * k)
+        + x * pairs * density ** (k - 2)
+    )
+    return max(1, int(memory_mb * 2**20 // per_board))
+
+
+def random_boards(
+    k: int, x: int, lower: int, bound: int, n: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    n boards distributed like utils.generate_random_subset_with_progression
+    (a random progression of length k plus x - k other numbers), sorted.
+    """
+    if x < k or x > bound - lower + 1:
+        raise ValueError("Invalid subset size")
+    max_d = (bound - lower) // (k - 1)
+    if max_d < 1:
+        raise ValueError("Bound too small")
+    d = rng.integers(1, max_d + 1, size=n)
+    a = lower + (rng.random(n) * (bound - (k - 1) * d - lower + 1)).astype(np.int64)
+    forced = a[:, None] + d[:, None] * np.arange(k)
+    # The other numbers: the x - k smallest random keys among the rest.
+    keys = rng.random((n, bound - lower + 1))
+    np.put_along_axis(keys, forced - lower, np.inf, axis=1)
+    others = np.argpartition(keys, x - k - 1, axis=1)[:, : x - k] + lower
+    return np.sort(np.concatenate([forced, others], axis=1), axis=1)
+
+
+def enumerate_aps(values: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    All progressions of length k of every board (sorted rows), as
+    (aps, valid): aps[b, m] holds the columns of the m-th progression of
+    board b for valid[b, m]. Like find_all_arithmetic_progressions, each
+    progression is found once, from its first two numbers.
+    """
+    n, x = values.shape
+    first, second = np.triu_indices(x, 1)
+    d = values[:, second] - values[:, first]
+    # column_of[b, v]: column of number v on board b, or -1.
+    top = int(values.max()) if n else 0
+    column_of = np.full((n, top + 1), -1, dtype=np.int32)
+    np.put_along_axis(column_of, values, np.arange(x, dtype=np.int32)[None], axis=1)
+    rows = np.arange(n)[:, None]
+    columns = [np.broadcast_to(first, d.shape), np.broadcast_to(second, d.shape)]
+    valid = np.ones(d.shape, dtype=bool)
+    for m in range(2, k):
+        target = values[:, first] + m * d
+        column = column_of[rows, np.minimum(target, top)]
+        valid &= (target <= top) & (column >= 0)
+        columns.append(column)
+    aps = np.stack(columns, axis=2)
+    # Keep the valid ones, padded to the largest count.
+    count = int(valid.sum(axis=1).max()) if n else 0
+    order = np.argsort(~valid, axis=1, kind="stable")[:, :count]
+    aps = np.take_along_axis(aps, order[:, :, None], axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+    aps[~valid] = 0
+    return aps.astype(np.intp), valid
+
+
+class BatchedGames:
+    """
+    Lockstep state of a batch of games.
+
+    held[p][b, m] counts the numbers player p + 1 holds in progression m of
+    board b, as in engine.Game, and a game ends when a player completes a
+    progression, neither player has a live one left, or the board is full.
+    winner is 0 (draw or unfinished), 1 or 2.
+    """
+
+    def __init__(self, values: np.ndarray, k: int):
+        self.values = values
+        self.k = k
+        n, x = values.shape
+        self.aps, self.valid = enumerate_aps(values, k)
+        m = self.aps.shape[1]
+        # incidence[b, c, m]: column c is in progression m of board b.
+        self.incidence = np.zeros((n, x, m), dtype=np.int8)
+        b, j = np.nonzero(self.valid)
+        for t in range(k):
+            self.incidence[b, self.aps[b, j, t], j] = 1
+        self.free = np.ones((n, x), dtype=bool)
+        self.owner = np.zeros((n, x), dtype=np.int8)
+        self.held = np.zeros((2, n, m), dtype=np.int8)
+        self.active = np.ones(n, dtype=bool)
+        self.winner = np.zeros(n, dtype=np.int8)
+        self.moves = np.zeros(n, dtype=np.int32)
+        self.order = np.full((n, x), -1, dtype=np.int32)  # columns in move order
+        # nearest[p][b, c]: distance from column c to player p + 1's closest number.
+        self.nearest = np.full((2, n, x), np.inf)
+        self.player = 0  # 0 for player1, 1 for player2
+        # A board without progressions cannot be won.
+        self.active &= self.valid.any(axis=1)
+
+    def step(self, idx: np.ndarray, columns: np.ndarray) -> None:
+        """Plays columns[i] on board idx[i] for the player to move."""
+        p = self.player
+        self.free[idx, columns] = False
+        self.owner[idx, columns] = p + 1
+        self.order[idx, self.moves[idx]] = columns
+        self.moves[idx] += 1
+        taken = self.values[idx, columns][:, None]
+        self.nearest[p, idx] = np.minimum(
+            self.nearest[p, idx], np.abs(self.values[idx] - taken)
+        )
+        held = self.held[p, idx] + self.incidence[idx, columns]
+        self.held[p, idx] = held
+        valid = self.valid[idx]
+        won = ((held == self.k) & valid).any(axis=1)
+        self.winner[idx[won]] = p + 1
+        live_other = (valid & (held == 0)).any(axis=1)
+        live_self = (valid & (self.held[1 - p, idx] == 0)).any(axis=1)
+        full = ~self.free[idx].any(axis=1)
+        self.active[idx[won | full | ~(live_self | live_other)]] = False
+        self.player = 1 - p
+
+
+# Vectorised strategies: (games, indices of the boards to move on, rng) ->
+# the column to play on each of them, mirroring the choose_move of the same
+# name in algorithms/algorithms.py. Ties go to the smallest number, the
+# order in which those iterate over a set of small integers.
+
+Strategy = Callable[[BatchedGames, np.ndarray, np.random.Generator], np.ndarray]
+
+
+def _pick(scores: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Column of the best score per row, ties broken at random."""
+    top = scores.max(axis=1, keepdims=True)
+    noise = np.where(scores == top, rng.random(scores.shape), -1.0)
+    return noise.argmax(axis=1)
+
+
+def random_strategy(g: BatchedGames, idx: np.ndarray, rng) -> np.ndarray:
+    return _pick(np.where(g.free[idx], 0.0, -np.inf), rng)
+
+
+def min_strategy(g: BatchedGames, idx: np.ndarray, rng) -> np.ndarray:
+    # Rows are sorted: the first free column holds the smallest number.
+    return g.free[idx].argmax(axis=1)
+
+
+def heuristic_strategy(g: BatchedGames, idx: np.ndarray, rng) -> np.ndarray:
+    values = g.values[idx]
+    free = g.free[idx]
+    # statistics.median of the free numbers: rows are sorted, so the middle
+    # two free numbers are found by rank.
+    rank = np.cumsum(free, axis=1)
+    count = rank[:, -1:]
+    low = (rank >= (count + 1) // 2).argmax(axis=1)
+    high = (rank >= count // 2 + 1).argmax(axis=1)
+    rows = np.arange(len(idx))
+    median = (values[rows, low] + values[rows, high])[:, None] / 2
+    score = -np.abs(values - median)
+    nearest = g.nearest[g.player, idx]
+    score = np.where(np.isfinite(nearest), score - nearest, score)
+    return np.where(free, score, -np.inf).argmax(axis=1)
+
+
+def overlap_max_strategy(g: BatchedGames, idx: np.ndarray, rng) -> np.ndarray:
+    p = g.player
+    own, opp = g.held[p, idx], g.held[1 - p, idx]
+    valid = g.valid[idx]
+    free = g.free[idx]
+    incidence = g.incidence[idx]
+
+    def best(possible: np.ndarray, held: np.ndarray):
+        """(max overlap or 0, candidate frequency over the best APs)."""
+        overlap = np.where(possible, held, -1)
+        top = overlap.max(axis=1, keepdims=True)
+        chosen = possible & (overlap == top)
+        freq = np.einsum("bcm,bm->bc", incidence, chosen.astype(np.int32))
+        return np.maximum(top[:, 0], 0), np.where(free, freq, 0)
+
+    self_ov, self_freq = best(valid & (opp == 0), own)
+    opp_ov, opp_freq = best(valid & (own == 0), opp)
+    offense = (self_ov >= opp_ov) & (self_freq.max(axis=1) > 0)
+    defense = ~offense & (opp_freq.max(axis=1) > 0)
+    freq = np.where(offense[:, None], self_freq, opp_freq).astype(np.float64)
+    # Neither: any free number.
+    freq = np.where((offense | defense)[:, None], freq, free)
+    return _pick(np.where(free, freq, -np.inf), rng)
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    "random": random_strategy,
+    "min": min_strategy,
+    "heuristic": heuristic_strategy,
+    "overlap_max": overlap_max_strategy,
+}
+
+
+def play_batch(
+    values: np.ndarray,
+    k: int,
+    algo1: str,
+    algo2: str,
+    rng: np.random.Generator,
+) -> Tuple[BatchedGames, float, float]:
+    """
+    Plays algo1 (player1) against algo2 on every board of values.
+    Returns the finished games and the time each side spent choosing.
+    """
+    games = BatchedGames(values, k)
+    strategies = (STRATEGIES[algo1], STRATEGIES[algo2])
+    spent = [0.0, 0.0]
+    while games.active.any():
+        idx = np.flatnonzero(games.active)
+        start = time.perf_counter()
+        columns = strategies[games.player](games, idx, rng)
+        spent[games.player] += time.perf_counter() - start
+        games.step(idx, columns)
+    return games, spent[0], spent[1]
+
+
+def tally(
+    results: Dict[str, Any],
+    a1: str,
+    a2: str,
+    winners: np.ndarray,
+    t1: float,
+    t2: float,
+) -> None:
+    """benchmark.record_result for a whole batch of a1 against a2."""
+    wins = int((winners == 1).sum())
+    losses = int((winners == 2).sum())
+    draws = len(winners) - wins - losses
+    results["wins"][a1] += wins
+    results["losses"][a2] += wins
+    results["wins"][a2] += losses
+    results["losses"][a1] += losses
+    results["draws"][a1] += draws
+    results["draws"][a2] += draws
+    results["points"][a1] += wins + 0.5 * draws
+    results["points"][a2] += losses + 0.5 * draws
+    results["matchups"][a1][a2]["wins"] += wins
+    results["matchups"][a2][a1]["wins"] += losses
+    results["matchups"][a1][a2]["draws"] += draws
+    results["execution_time"][a1] += t1
+    results["execution_time"][a2] += t2
+    results["total_games"] += len(winners)
+
+
+def run_batched_tournament(
+    settings: Dict[str, Any],
+    num_games: int = 10,
+    algos: Optional[List[str]] = None,
+    batch_size: int = 4096,
+    corpus: Optional[str] = None,
+    seed: Optional[int] = None,
+    save_moves: bool = False,
+    memory_mb: int = BATCH_MEMORY_MB,
+) -> Dict[str, Any]:
+    """
+    benchmark.run_tournament for the strategies in STRATEGIES: every
+    ordered pairing plays num_games games (each board of the corpus, if
+    given), batch_size at a time, and the same aggregate statistics are
+    written. batch_size is lowered for boards too large for a batch of it
+    to fit in memory_mb. With save_moves, the games of the first batch of
+    every pairing are saved as move logs.
+    """
+    algos = algos or list(STRATEGIES)
+    unknown = [a for a in algos if a not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"No batched version of: {', '.join(unknown)}")
+    rng = np.random.default_rng(seed)
+    k, x, lower, bound = (settings[key] for key in ("k", "x", "lower", "bound"))
+    grids = None
+    if corpus:
+        settings, boards = load_corpus(corpus)
+        k, x, lower, bound = (settings[key] for key in ("k", "x", "lower", "bound"))
+        grids = np.sort(np.array([grid for grid, _, _ in boards], dtype=np.int64))
+        num_games = len(grids)
+        print(f"Using corpus {corpus}: {num_games} boards, settings {settings}")
+
+    limit = batch_limit(k, x, lower, bound, memory_mb)
+    if batch_size > limit:
+        print(
+            f"Batch size lowered from {batch_size} to {limit} to fit in {memory_mb} MB"
+        )
+        batch_size = limit
+
+    os.makedirs(STATS_DIR, exist_ok=True)
+    pairings = list(itertools.permutations(algos, 2))
+    print(
+        f"Running batched experiments: {len(algos)} algorithms, {num_games} games "
+        f"each pairing ({len(pairings) * num_games} total games)..."
+    )
+    results = new_results(algos)
+    start = time.perf_counter()
+    for a1, a2 in pairings:
+        for first in range(0, num_games, batch_size):
+            n = min(batch_size, num_games - first)
+            if grids is not None:
+                values = grids[first : first + n]
+            else:
+                values = random_boards(k, x, lower, bound, n, rng)
+            games, t1, t2 = play_batch(values, k, a1, a2, rng)
+            tally(results, a1, a2, games.winner, t1, t2)
+            if save_moves and first == 0:
+                save_batch_logs(settings, games, a1, a2)
+    elapsed = time.perf_counter() - start
+    results["batched"] = {
+        "batch_size": batch_size,
+        "wall_time": elapsed,
+        "games_per_sec": results["total_games"] / elapsed if elapsed else 0.0,
+    }
+    save_results(results)
+    print(f"{results['total_games']} games in {elapsed:.1f}s")
+    return results
+
+
+def save_batch_logs(
+    settings: Dict[str, Any], games: BatchedGames, a1: str, a2: str
+) -> None:
+    """Move logs of every game of the batch, as benchmark.save_move_log."""
+    os.makedirs(MOVES_DIR, exist_ok=True)
+    for b in range(len(games.values)):
+        columns = games.order[b, : games.moves[b]]
+        save_move_log(
+            settings,
+            games.values[b].tolist(),
+            a1,
+            a2,
+            b + 1,
+            games.values[b][columns].tolist(),
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Round-robin tournament of the cheap strategies, many games at a time."
+    )
+    parser.add_argument(
+        "--config",
+        required=False,
+        help="Path to JSON config with k, x, lower, bound and num_games (as for benchmark.py).",
+    )
+    parser.add_argument(
+        "--corpus",
+        required=False,
+        help="Path to a board corpus (.npz from corpus.py) to play instead of fresh boards.",
+    )
+    parser.add_argument(
+        "--games", type=int, default=None, help="Games per pairing (overrides config)."
+    )
+    parser.add_argument(
+        "--algorithms",
+        nargs="+",
+        choices=sorted(STRATEGIES),
+        default=None,
+        help="Strategies to include (default: all with a batched version).",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=4096, help="Games played at once."
+    )
+    parser.add_argument(
+        "--memory-mb",
+        type=int,
+        default=BATCH_MEMORY_MB,
+        help=f"Memory a batch may take; caps the batch size on large boards (default: {BATCH_MEMORY_MB}).",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+    args = parser.parse_args()
+
+    cfg = {"k": 4, "x": 30, "lower": 1, "bound": 100, "num_games": 10}
+    if args.config:
+        with open(args.config) as f:
+            cfg.update(json.load(f))
+    if args.games:
+        cfg["num_games"] = args.games
+
+    run_batched_tournament(
+        settings={key: cfg[key] for key in ("k", "x", "lower", "bound")},
+        num_games=cfg["num_games"],
+        algos=args.algorithms,
+        batch_size=args.batch_size,
+        corpus=args.corpus,
+        seed=args.seed,
+        save_moves=cfg.get("save_moves", False),
+        memory_mb=args.memory_mb,
+    )
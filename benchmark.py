@@ -1,76 +1,151 @@
 import os
 import json
 import time
+import random
 import argparse
 import itertools
 from collections import defaultdict
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional, Callable
 
 from algorithms import registry
-from game import Game  # Game.__init__(self, k, x, lower, bound)
+from algorithms.control import SearchControl, use_control
+from engine import Game  # Game.__init__(self, k, x, lower, bound, board=None)
+from corpus import load_corpus
+from ratings import compute_ratings
+from scheduler import SPRTScheduler
+from metrics import MetricsRegistry, print_summary
+from memprofile import MemoryProfiler, MemoryCeilingExceeded
+import memprofile
+from timecontrol import TimeControl, TimeForfeit, AgentProcess, Clock
+import timecontrol
+import tracing
+import book
+import solved
 
 MOVES_DIR = "saved_runs_moves"
 STATS_DIR = "saved_games"
 
 
 def play_game(
-    game: Game, algo1: str, algo2: str, record_moves: bool = False
+    game: Game,
+    algo1: str,
+    algo2: str,
+    record_moves: bool = False,
+    metrics: Optional[MetricsRegistry] = None,
+    memory: Optional[MemoryProfiler] = None,
+    time_control: Optional[TimeControl] = None,
+    on_move: Optional[Callable[[Game, int, Dict[str, Any]], None]] = None,
 ) -> Tuple[int, float, float, List[int]]:
     """
     Simulates a single game between algo1 (player1) and algo2 (player2).
+    If a MetricsRegistry is given, every move's latency and the search
+    statistics reported by the algorithm are recorded in it.
+    If a MemoryProfiler is given, every move's memory use is recorded, and
+    an algorithm going over the profiler's ceiling forfeits the game.
+    If a TimeControl is given, both algorithms run in worker processes and
+    every move gets its budget from the player's clock; overruns get a
+    fallback move or forfeit the game, as the TimeControl says.
+    If on_move is given, it is called as on_move(game, move, stats) before
+    every move is made, with the search statistics of the move.
     Returns (winner, time1, time2, moves_log).
     """
     moves_log: List[int] = []
-    t1 = t2 = 0.0
+    t1 = t2 = 0
 
     strat1 = registry.get(algo1.lower(), registry["random"])
     strat2 = registry.get(algo2.lower(), registry["random"])
 
-    while not game.game_over:
-        if game.player1_turn:
-            start = time.time()
-            move = strat1(
-                list(game.available_numbers),
-                game.player1_moves,
-                game.player2_moves,
-                game.k,
-            )
-            t1 += time.time() - start
-        else:
-            start = time.time()
-            move = strat2(
-                list(game.available_numbers),
-                game.player2_moves,
-                game.player1_moves,
-                game.k,
-            )
-            t2 += time.time() - start
+    agents: Dict[int, AgentProcess] = {}
+    clocks: Dict[int, Clock] = {}
+    if time_control is not None:
+        agents = {1: AgentProcess(algo1), 2: AgentProcess(algo2)}
+        clocks = {1: time_control.new_clock(), 2: time_control.new_clock()}
 
-        game.make_move(move)
-        if record_moves:
-            moves_log.append(move)
+    def choose(algo, strat, own, opp) -> int:
+        args = (list(game.available_numbers), own, opp, game.k)
+        if memory is not None:
+            return memory.call(algo, strat, *args)
+        return strat(*args)
 
-    winner_code = game.winner or 0
-    return winner_code, t1, t2, moves_log
+    def choose_timed(player, algo, own, opp) -> Tuple[int, Dict[str, Any]]:
+        available = list(game.available_numbers)
+        clock = clocks[player]
+        budget, limit = clock.budget(len(available))
+        start = time.perf_counter()
+        reply = agents[player].choose(available, own, opp, game.k, budget, limit)
+        if not clock.spend(time.perf_counter() - start, timed_out=reply is None):
+            return reply
+        # A late reply counts as an overrun too, so a clock can run out.
+        if time_control.overrun == "forfeit":
+            if reply is None:
+                raise TimeForfeit(f"{algo}: {agents[player].error}")
+            raise TimeForfeit(f"{algo} ran over its {budget:.3f}s budget")
+        return random.choice(available), {}
 
+    if memory is not None:
+        memory.begin_game()
+    forfeit = 0
+    try:
+        while not game.game_over:
+            player = 1 if game.player1_turn else 2
+            if player == 1:
+                algo, strat = algo1, strat1
+                own, opp = game.player1_moves, game.player2_moves
+            else:
+                algo, strat = algo2, strat2
+                own, opp = game.player2_moves, game.player1_moves
 
-def run_tournament(
-    settings: Dict[str, Any], num_games: int = 10, save_moves: bool = False
-) -> Dict[str, Any]:
-    """
-    Runs every ordered pairing of registered algorithms num_games times.
-    Saves per-game move logs if requested, and writes aggregate stats.
-    """
-    os.makedirs(MOVES_DIR, exist_ok=True)
-    os.makedirs(STATS_DIR, exist_ok=True)
+            start = time.perf_counter_ns()
+            stats = None
+            try:
+                if time_control is not None:
+                    move, stats = choose_timed(player, algo, own, opp)
+                elif metrics is not None or on_move is not None:
+                    with use_control(SearchControl()) as control:
+                        move = choose(algo, strat, own, opp)
+                    stats = control.stats
+                else:
+                    move = choose(algo, strat, own, opp)
+            except (MemoryCeilingExceeded, TimeForfeit) as e:
+                print(f"Forfeit: {e}")
+                forfeit = player
+                game.winner = 2 if player == 1 else 1
+                game.game_over = True
+                break
+            elapsed = time.perf_counter_ns() - start
 
-    algos = list(registry.keys())
-    total_matches = len(algos) * (len(algos) - 1) * num_games
-    print(
-        f"Running experiments: {len(algos)} algorithms, {num_games} games each pairing ({total_matches} total games)..."
-    )
+            if player == 1:
+                t1 += elapsed
+            else:
+                t2 += elapsed
+            if metrics is not None:
+                metrics.record_move(algo, game.turn_count, elapsed)
+                if stats:
+                    metrics.record_search(algo, stats)
+
+            if on_move is not None:
+                on_move(game, move, stats or {})
+            game.make_move(move)
+            if record_moves:
+                moves_log.append(move)
+    finally:
+        for agent in agents.values():
+            agent.close()
 
-    results = {
+    if metrics is not None:
+        metrics.record_game()
+    if memory is not None:
+        memory.end_game()
+    if time_control is not None:
+        time_control.record(algo1, clocks[1], forfeited=forfeit == 1)
+        time_control.record(algo2, clocks[2], forfeited=forfeit == 2)
+    winner_code = game.winner or 0
+    return winner_code, t1 / 1e9, t2 / 1e9, moves_log
+
+
+def new_results(algos: List[str]) -> Dict[str, Any]:
+    """Empty aggregate statistics table for the given algorithms."""
+    return {
         "wins": defaultdict(int),
         "losses": defaultdict(int),
         "draws": defaultdict(int),
@@ -82,56 +157,63 @@ def run_tournament(
         "total_games": 0,
     }
 
-    k = settings["k"]
-    x = settings["x"]
-    lower = settings["lower"]
-    bound = settings["bound"]
 
-    for a1, a2 in itertools.permutations(algos, 2):
-        for i in range(1, num_games + 1):
-            game = Game(k, x, lower, bound)
-            winner, t1, t2, moves = play_game(game, a1, a2, record_moves=save_moves)
-
-            # Tally results
-            if winner == 1:
-                results["wins"][a1] += 1
-                results["losses"][a2] += 1
-                results["points"][a1] += 1
-                results["matchups"][a1][a2]["wins"] += 1
-            elif winner == 2:
-                results["wins"][a2] += 1
-                results["losses"][a1] += 1
-                results["points"][a2] += 1
-                results["matchups"][a2][a1]["wins"] += 1
-            else:
-                results["draws"][a1] += 1
-                results["draws"][a2] += 1
-                results["points"][a1] += 0.5
-                results["points"][a2] += 0.5
-                results["matchups"][a1][a2]["draws"] += 1
-
-            results["execution_time"][a1] += t1
-            results["execution_time"][a2] += t2
-            results["total_games"] += 1
-
-            # Save move log if requested, filename now includes the game ID
-            if save_moves:
-                fname = f"{a1}_vs_{a2}_game_{i}.json"
-                with open(os.path.join(MOVES_DIR, fname), "w") as f:
-                    json.dump(
-                        {
-                            "settings": settings,
-                            "grid": game.X,
-                            "first_player": a1,
-                            "second_player": a2,
-                            "game_id": i,
-                            "moves": moves,
-                        },
-                        f,
-                        indent=2,
-                    )
-
-    # Write out aggregate statistics
+def record_result(
+    results: Dict[str, Any], a1: str, a2: str, winner: int, t1: float, t2: float
+) -> None:
+    """Tallies one finished game of a1 (player1) against a2 (player2)."""
+    if winner == 1:
+        results["wins"][a1] += 1
+        results["losses"][a2] += 1
+        results["points"][a1] += 1
+        results["matchups"][a1][a2]["wins"] += 1
+    elif winner == 2:
+        results["wins"][a2] += 1
+        results["losses"][a1] += 1
+        results["points"][a2] += 1
+        results["matchups"][a2][a1]["wins"] += 1
+    else:
+        results["draws"][a1] += 1
+        results["draws"][a2] += 1
+        results["points"][a1] += 0.5
+        results["points"][a2] += 0.5
+        results["matchups"][a1][a2]["draws"] += 1
+
+    results["execution_time"][a1] += t1
+    results["execution_time"][a2] += t2
+    results["total_games"] += 1
+
+
+def save_move_log(
+    settings: Dict[str, Any],
+    grid: List[int],
+    a1: str,
+    a2: str,
+    game_id: int,
+    moves: List[int],
+) -> None:
+    """Saves a game's move log; the filename includes the game ID."""
+    fname = f"{a1}_vs_{a2}_game_{game_id}.json"
+    with open(os.path.join(MOVES_DIR, fname), "w") as f:
+        json.dump(
+            {
+                "settings": settings,
+                "grid": grid,
+                "first_player": a1,
+                "second_player": a2,
+                "game_id": game_id,
+                "moves": moves,
+            },
+            f,
+            indent=2,
+        )
+
+
+def save_results(results: Dict[str, Any]) -> str:
+    """Adds ratings, writes the aggregate statistics and prints a summary."""
+    algos = list(results["matchups"].keys())
+    results["ratings"] = compute_ratings(algos, results["matchups"])
+
     timestamp = int(time.time())
     stats_file = os.path.join(STATS_DIR, f"tournament_{timestamp}.json")
     with open(stats_file, "w") as f:
@@ -139,9 +221,147 @@ def run_tournament(
 
     print(f"Experiments completed. Results saved to {stats_file}")
     ranking = sorted(results["points"].items(), key=lambda x: -x[1])
+    if "pairings" in results:
+        # Pairings play unequal numbers of games, so points are not comparable.
+        ranking.sort(key=lambda x: -results["ratings"][x[0]]["elo"])
     for algo, pts in ranking:
-        print(f"{algo}: {pts} points")
+        rating = results["ratings"][algo]
+        print(f"{algo}: {pts} points, Elo {rating['elo']:+.0f} ± {rating['error']:.0f}")
+    for pairing, state in results.get("pairings", {}).items():
+        verdict = f"{state['stronger']} stronger" if state["stronger"] else "undecided"
+        print(f"{pairing}: {state['games']} games, {verdict}")
+    if "metrics" in results:
+        print_summary(results["metrics"])
+    if "memory" in results:
+        memprofile.print_summary(results["memory"])
+    if "time_control" in results:
+        timecontrol.print_summary(results["time_control"])
+    return stats_file
 
+
+def run_tournament(
+    settings: Dict[str, Any],
+    num_games: int = 10,
+    save_moves: bool = False,
+    corpus: Optional[str] = None,
+    adaptive: bool = False,
+    sprt: Optional[Dict[str, float]] = None,
+    metrics: bool = False,
+    memory: Optional[Dict[str, Any]] = None,
+    time_control: Optional[Dict[str, Any]] = None,
+    opening_book: Optional[str] = None,
+    solved_store: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Runs every ordered pairing of registered algorithms num_games times.
+    If a corpus path is given, the settings are taken from the corpus and
+    every pairing plays each of its boards once instead (both colours are
+    covered since the pairings are ordered).
+    With adaptive=True the same total number of games is scheduled by an
+    SPRTScheduler instead: pairings stop once their SPRT (parameters in
+    sprt, see scheduler.DEFAULT_SPRT) is decided and the leftover budget
+    goes to the close ones.
+    With metrics=True, per-move latency distributions and throughput are
+    added to the stats under "metrics".
+    memory, if given, holds MemoryProfiler options (mode, ceiling_mb); per
+    move and per game memory use is then added under "memory", and an
+    algorithm over the ceiling forfeits its game.
+    time_control, if given, holds TimeControl options (per_move, or base
+    and increment, and the overrun policy); clock usage is then added
+    under "time_control".
+    opening_book, if given, is the path of a book (see book.py) the search
+    algorithms play their opening moves from.
+    solved_store, if given, is the path of a solved-position database (see
+    solved.py) the search algorithms look positions up in and add to.
+    Saves per-game move logs if requested, and writes aggregate stats.
+    """
+    boards = None
+    if corpus:
+        settings, boards = load_corpus(corpus)
+        num_games = len(boards)
+        print(f"Using corpus {corpus}: {num_games} boards, settings {settings}")
+
+    os.makedirs(MOVES_DIR, exist_ok=True)
+    os.makedirs(STATS_DIR, exist_ok=True)
+
+    algos = list(registry.keys())
+    total_matches = len(algos) * (len(algos) - 1) * num_games
+    mode = "adaptive budget of " if adaptive else ""
+    print(
+        f"Running experiments: {len(algos)} algorithms, {num_games} games each pairing ({mode}{total_matches} total games)..."
+    )
+
+    results = new_results(algos)
+    metrics_registry = MetricsRegistry() if metrics else None
+    profiler = MemoryProfiler(**memory) if memory is not None else None
+    clock = TimeControl(**time_control) if time_control is not None else None
+    if profiler is not None and clock is not None:
+        raise ValueError(
+            "Memory profiling measures this process only; it cannot be combined "
+            "with time controls, which run the algorithms in worker processes."
+        )
+
+    if opening_book:
+        book.load(opening_book)
+        # Agent processes of time controls load it at import.
+        os.environ[book.BOOK_ENV] = opening_book
+        results["book"] = opening_book
+    if solved_store:
+        solved.use(solved_store)
+        os.environ[solved.SOLVED_ENV] = solved_store
+        results["solved"] = solved_store
+
+    k = settings["k"]
+    x = settings["x"]
+    lower = settings["lower"]
+    bound = settings["bound"]
+
+    if adaptive:
+        scheduler = SPRTScheduler(algos, total_matches, sprt=sprt)
+        # Both games of a scheduler round share a board.
+        jobs = ((a1, a2, i, (i - 1) // 2) for a1, a2, i in scheduler)
+    else:
+        scheduler = None
+        jobs = (
+            (a1, a2, i, i - 1)
+            for a1, a2 in itertools.permutations(algos, 2)
+            for i in range(1, num_games + 1)
+        )
+
+    for a1, a2, i, board_idx in jobs:
+        board = boards[board_idx % len(boards)] if boards else None
+        with tracing.span("game", first=a1, second=a2, game_id=i):
+            game = Game(k, x, lower, bound, board=board)
+            winner, t1, t2, moves = play_game(
+                game,
+                a1,
+                a2,
+                record_moves=save_moves,
+                metrics=metrics_registry,
+                memory=profiler,
+                time_control=clock,
+            )
+
+        record_result(results, a1, a2, winner, t1, t2)
+        if scheduler:
+            scheduler.update(a1, a2, winner)
+
+        if save_moves:
+            save_move_log(settings, game.X, a1, a2, i, moves)
+
+    if scheduler:
+        results["pairings"] = scheduler.summary()
+    if metrics_registry is not None:
+        results["metrics"] = metrics_registry.summary()
+    if profiler is not None:
+        results["memory"] = profiler.summary()
+    if clock is not None:
+        results["time_control"] = clock.summary()
+
+    save_results(results)
+    trace_file = tracing.save()
+    if trace_file:
+        print(f"Trace written to {trace_file}")
     return results
 
 
@@ -164,7 +384,73 @@ if __name__ == "__main__":
             "}"
         ),
     )
+    parser.add_argument(
+        "--corpus",
+        required=False,
+        help="Path to a board corpus (.npz from corpus.py) to play instead of fresh boards.",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Stop pairings early once an SPRT decides them (same total game budget).",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Record per-move latency distributions and throughput.",
+    )
+    parser.add_argument(
+        "--memory",
+        choices=["tracemalloc", "rss"],
+        required=False,
+        help="Record per-move and per-game memory use of every algorithm.",
+    )
+    parser.add_argument(
+        "--memory-ceiling",
+        type=float,
+        required=False,
+        help="Memory ceiling in MB per algorithm; going over it forfeits the game.",
+    )
+    parser.add_argument(
+        "--time-per-move",
+        type=float,
+        required=False,
+        help="Fixed time control: seconds per move.",
+    )
+    parser.add_argument(
+        "--clock",
+        type=float,
+        nargs=2,
+        metavar=("BASE", "INCREMENT"),
+        required=False,
+        help="Clock time control: seconds per game plus an increment per move.",
+    )
+    parser.add_argument(
+        "--on-overrun",
+        choices=["fallback", "forfeit"],
+        default="fallback",
+        help="Play a random move (fallback) or lose the game (forfeit) on overrun.",
+    )
+    parser.add_argument(
+        "--book",
+        required=False,
+        help="Opening book (from book.py) for the search algorithms to play from.",
+    )
+    parser.add_argument(
+        "--solved",
+        nargs="?",
+        const=solved.SOLVED_PATH,
+        required=False,
+        help=f"Solved-position database to share across games and runs (default path: {solved.SOLVED_PATH}).",
+    )
+    parser.add_argument(
+        "--trace",
+        required=False,
+        help="Write a Chrome trace (open in Perfetto) of the tournament to this path.",
+    )
     args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
 
     # Default config
     cfg = {
@@ -174,10 +460,44 @@ if __name__ == "__main__":
         "bound": 100,
         "num_games": 10,
         "save_moves": False,
+        "corpus": None,
+        "adaptive": False,
+        "metrics": False,
+        "memory": None,
+        "memory_ceiling_mb": None,
+        "time_control": None,
+        "book": None,
+        "solved": None,
     }
     if args.config:
         with open(args.config) as f:
             cfg.update(json.load(f))
+    if args.corpus:
+        cfg["corpus"] = args.corpus
+    if args.adaptive:
+        cfg["adaptive"] = True
+    if args.metrics:
+        cfg["metrics"] = True
+    if args.memory:
+        cfg["memory"] = args.memory
+    if args.memory_ceiling:
+        cfg["memory_ceiling_mb"] = args.memory_ceiling
+    if args.time_per_move:
+        cfg["time_control"] = {"per_move": args.time_per_move}
+    elif args.clock:
+        cfg["time_control"] = {"base": args.clock[0], "increment": args.clock[1]}
+    if args.book:
+        cfg["book"] = args.book
+    if args.solved:
+        cfg["solved"] = args.solved
+    if cfg["time_control"] and args.on_overrun != "fallback":
+        cfg["time_control"]["overrun"] = args.on_overrun
+    memory_options = None
+    if cfg["memory"] or cfg["memory_ceiling_mb"]:
+        memory_options = {
+            "mode": cfg["memory"] or "tracemalloc",
+            "ceiling_mb": cfg["memory_ceiling_mb"],
+        }
 
     run_tournament(
         settings={
@@ -188,4 +508,12 @@ if __name__ == "__main__":
         },
         num_games=cfg["num_games"],
         save_moves=cfg["save_moves"],
+        corpus=cfg["corpus"],
+        adaptive=cfg["adaptive"],
+        sprt=cfg.get("sprt"),
+        metrics=cfg["metrics"],
+        memory=memory_options,
+        time_control=cfg["time_control"],
+        opening_book=cfg["book"],
+        solved_store=cfg["solved"],
     )
@@ -0,0 +1,259 @@
+import os
+import mmap
+import struct
+import argparse
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+
+from symmetry import canonicalize, canonical_hash
+from metrics import instant_stats
+
+# Setting this environment variable to a book path loads it at import time,
+# e.g. in worker processes.
+BOOK_ENV = "SZEMEREDI_BOOK"
+BOOK_DIR = "books"
+
+# File layout: a header, then fixed-size records sorted by position hash so
+# that a lookup is a binary search over the memory-mapped file and loading
+# a book reads nothing up front. Moves are stored in canonical coordinates
+# (see symmetry.canonicalize) and mapped back onto the board being played.
+MAGIC = b"SZBOOK\x00\x01"
+HEADER = struct.Struct("<8sII")  # magic, k, number of records
+RECORD = struct.Struct("<QiIf")  # position hash, move, visits, value
+
+Entry = Tuple[int, int, float]  # canonical move, visits, value for the mover
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file.
+
+    Positions are keyed by the canonical hash of (board, numbers held by
+    the player to move, numbers held by the other player, k), so a board
+    and every board equivalent to it under n -> a * n + b share entries.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.k, self.count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _record(self, i: int) -> Tuple[int, int, int, float]:
+        return RECORD.unpack_from(self._mm, HEADER.size + i * RECORD.size)
+
+    def lookup(self, key: int) -> Optional[Entry]:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            h, move, visits, value = self._record(mid)
+            if h == key:
+                return move, visits, value
+            if h < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def probe(
+        self,
+        available_moves: List[int],
+        current_held: List[int],
+        opponent_held: List[int],
+        k: int,
+    ) -> Optional[Tuple[int, int, float]]:
+        """(move, visits, value) stored for the position, or None."""
+        if k != self.k:
+            return None
+        canonical = canonicalize(
+            set(available_moves) | set(current_held) | set(opponent_held),
+            current_held,
+            opponent_held,
+        )
+        entry = self.lookup(canonical_hash(canonical, k))
+        if entry is None:
+            return None
+        move = canonical.transform.invert(entry[0])
+        if move not in available_moves:
+            return None
+        return move, entry[1], entry[2]
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int, float]]:
+        for i in range(self.count):
+            yield self._record(i)
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def write_book(path: str, k: int, entries: Dict[int, Entry]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, k, len(entries)))
+        for key in sorted(entries):
+            move, visits, value = entries[key]
+            f.write(RECORD.pack(key, move, visits, value))
+
+
+_book: Optional[OpeningBook] = None
+
+
+def load(path: Optional[str]) -> Optional[OpeningBook]:
+    """Makes path the book probe() consults; None unloads it."""
+    global _book
+    if _book is not None:
+        _book.close()
+    _book = OpeningBook(path) if path else None
+    return _book
+
+
+def probe(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+) -> Optional[Tuple[int, int, float]]:
+    """Book entry for the position from the loaded book, if any. Costs a
+    single check when no book is loaded."""
+    if _book is None:
+        return None
+    return _book.probe(available_moves, current_held, opponent_held, k)
+
+
+def book_stats(visits: int, value: float) -> Dict[str, Any]:
+    """Search statistics reported for a move played from the book."""
+    return instant_stats(book=True, book_visits=visits, book_value=value)
+
+
+# Building
+
+
+def search_position(
+    board: List[int],
+    mover: List[int],
+    other: List[int],
+    k: int,
+    simulations: int,
+) -> List[List[float]]:
+    """[move, visits, mean result for the mover] of every root child of a
+    deep RAVE search, most visited first."""
+    # Imported here: probing a book must not pull in the algorithms.
+    from algorithms.MCTSNode import RAVENode
+    from algorithms.algorithms import run_simulations, root_visits
+
+    held = set(mover) | set(other)
+    available = [n for n in board if n not in held]
+    root = RAVENode(available, list(mover), list(other), True, k)
+    if root.is_terminal():
+        return []
+    run_simulations(root, simulations)
+    return root_visits(root)
+
+
+def build_board(job: Tuple[List[int], int, int, int, int]) -> Dict[int, Entry]:
+    """
+    Book entries of one board: breadth-first over the first plies, every
+    position searched with simulations rollouts and expanded into the
+    width most visited replies.
+    """
+    board, k, plies, width, simulations = job
+    entries: Dict[int, Entry] = {}
+    frontier = [((), ())]
+    for _ in range(plies):
+        next_frontier = []
+        for mover, other in frontier:
+            canonical = canonicalize(board, mover, other)
+            key = canonical_hash(canonical, k)
+            if key in entries or len(mover) + len(other) == len(board):
+                continue
+            visits = search_position(board, mover, other, k, simulations)
+            if not visits:
+                continue
+            move, count, value = visits[0]
+            entries[key] = (canonical.transform.apply(move), int(count), value)
+            for move, _, _ in visits[:width]:
+                next_frontier.append((other, mover + (move,)))
+        frontier = next_frontier
+    return entries
+
+
+def build_book(
+    boards: List[List[int]],
+    k: int,
+    plies: int = 4,
+    width: int = 3,
+    simulations: int = 20000,
+    workers: Optional[int] = None,
+) -> Dict[int, Entry]:
+    """Entries of all boards, searched in parallel, one board per task."""
+    import multiprocessing
+
+    jobs = [(list(board), k, plies, width, simulations) for board in boards]
+    entries: Dict[int, Entry] = {}
+    with multiprocessing.Pool(workers) as pool:
+        for done, board_entries in enumerate(pool.imap(build_board, jobs), 1):
+            for key, entry in board_entries.items():
+                # Equivalent boards meet at the same key; keep the deeper search.
+                if key not in entries or entry[1] > entries[key][1]:
+                    entries[key] = entry
+            print(f"{done}/{len(jobs)} boards, {len(entries)} positions")
+    return entries
+
+
+if os.environ.get(BOOK_ENV):
+    load(os.environ[BOOK_ENV])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build an opening book by deep searches of the first plies of a board corpus."
+    )
+    parser.add_argument(
+        "--corpus", required=True, help="Board corpus (.npz from corpus.py)."
+    )
+    parser.add_argument(
+        "--plies", type=int, default=4, help="Number of plies to cover per board."
+    )
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=3,
+        help="Replies followed per position (the most visited ones).",
+    )
+    parser.add_argument(
+        "--simulations", type=int, default=20000, help="Rollouts per position."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes (default: all CPUs).",
+    )
+    parser.add_argument(
+        "--out",
+        required=False,
+        help=f"Output path (default: {BOOK_DIR}/<corpus name>.book).",
+    )
+    args = parser.parse_args()
+
+    from corpus import load_corpus
+
+    settings, boards = load_corpus(args.corpus)
+    out = args.out or os.path.join(
+        BOOK_DIR, os.path.splitext(os.path.basename(args.corpus))[0] + ".book"
+    )
+    entries = build_book(
+        [grid for grid, _, _ in boards],
+        settings["k"],
+        plies=args.plies,
+        width=args.width,
+        simulations=args.simulations,
+        workers=args.workers,
+    )
+    write_book(out, settings["k"], entries)
+    print(f"Saved {len(entries)} positions to {out}")
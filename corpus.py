@@ -0,0 +1,119 @@
+import os
+import json
+import random
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from utils import (
+    find_all_arithmetic_progressions,
+    generate_random_subset_with_progression,
+)
+
+CORPUS_DIR = "corpora"
+
+Board = Tuple[List[int], List[int], List[List[int]]]
+
+
+def build_corpus(
+    settings: Dict[str, Any], num_boards: int, seed: Optional[int] = None
+) -> List[Board]:
+    """
+    Generates num_boards boards for the given (k, x, lower, bound) settings.
+    Each board is an (X, forced_prog, all_possible) triple.
+    """
+    rng_state = random.getstate()
+    if seed is not None:
+        random.seed(seed)
+    k = settings["k"]
+    boards: List[Board] = []
+    try:
+        for _ in range(num_boards):
+            X, forced = generate_random_subset_with_progression(
+                k, settings["x"], settings["lower"], settings["bound"]
+            )
+            boards.append((X, forced, find_all_arithmetic_progressions(k, X)))
+    finally:
+        if seed is not None:
+            random.setstate(rng_state)
+    return boards
+
+
+def save_corpus(path: str, settings: Dict[str, Any], boards: List[Board]) -> None:
+    """
+    Stores the boards as flat arrays in a compressed .npz file.
+    The APs of all boards are concatenated; ap_offsets[i]:ap_offsets[i + 1]
+    is the slice belonging to board i.
+    """
+    k = settings["k"]
+    ap_counts = [len(aps) for _, _, aps in boards]
+    aps = [ap for _, _, board_aps in boards for ap in board_aps]
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.savez_compressed(
+        path,
+        settings=np.array(
+            [k, settings["x"], settings["lower"], settings["bound"]], dtype=np.int64
+        ),
+        grids=np.array([X for X, _, _ in boards], dtype=np.int32).reshape(
+            len(boards), settings["x"]
+        ),
+        forced=np.array([f for _, f, _ in boards], dtype=np.int32).reshape(
+            len(boards), k
+        ),
+        aps=np.array(aps, dtype=np.int32).reshape(len(aps), k),
+        ap_offsets=np.concatenate(([0], np.cumsum(ap_counts))).astype(np.int64),
+    )
+
+
+def load_corpus(path: str) -> Tuple[Dict[str, int], List[Board]]:
+    """Returns (settings, boards) from a corpus written by save_corpus."""
+    with np.load(path) as data:
+        k, x, lower, bound = (int(v) for v in data["settings"])
+        grids = data["grids"].tolist()
+        forced = data["forced"].tolist()
+        aps = data["aps"].tolist()
+        offsets = data["ap_offsets"].tolist()
+    boards = [
+        (grids[i], forced[i], aps[offsets[i] : offsets[i + 1]])
+        for i in range(len(grids))
+    ]
+    return {"k": k, "x": x, "lower": lower, "bound": bound}, boards
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a fixed corpus of boards for reproducible tournaments."
+    )
+    parser.add_argument(
+        "--config",
+        required=False,
+        help="Path to JSON config with k, x, lower and bound (as used by benchmark.py).",
+    )
+    parser.add_argument(
+        "--boards", type=int, default=50, help="Number of boards to generate."
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+    parser.add_argument(
+        "--out",
+        required=False,
+        help=f"Output .npz path (default: {CORPUS_DIR}/corpus_k_x_lower_bound.npz).",
+    )
+    args = parser.parse_args()
+
+    cfg = {"k": 4, "x": 30, "lower": 1, "bound": 100}
+    if args.config:
+        with open(args.config) as f:
+            loaded = json.load(f)
+        cfg.update({key: loaded[key] for key in cfg if key in loaded})
+
+    out = args.out or os.path.join(
+        CORPUS_DIR,
+        f"corpus_{cfg['k']}_{cfg['x']}_{cfg['lower']}_{cfg['bound']}.npz",
+    )
+    boards = build_corpus(cfg, args.boards, seed=args.seed)
+    save_corpus(out, cfg, boards)
+    total_aps = sum(len(aps) for _, _, aps in boards)
+    print(f"Saved {len(boards)} boards ({total_aps} APs) to {out}")
@@ -0,0 +1,453 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import ipaddress
+import itertools
+import threading
+import subprocess
+from collections import deque
+from multiprocessing.connection import Listener, Client, Connection
+from typing import Dict, Any, List, Optional, Tuple
+
+from algorithms import registry
+from engine import Game
+from corpus import load_corpus
+from metrics import MetricsRegistry
+from benchmark import (
+    MOVES_DIR,
+    STATS_DIR,
+    play_game,
+    new_results,
+    record_result,
+    save_move_log,
+    save_results,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 6060
+AUTHKEY_ENV = "SZEMEREDI_AUTHKEY"
+# Connections unpickle what they receive, so the key is all that keeps other
+# machines from running code here; the public default only serves loopback.
+AUTHKEY = os.environ.get(AUTHKEY_ENV, "szemeredi").encode()
+
+
+def is_loopback(host: str) -> bool:
+    """Whether host (a name or an address) is this machine's loopback."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class Coordinator:
+    """
+    Serves the games of a round-robin tournament to workers over TCP.
+
+    A job is leased to the worker that requested it; if that worker
+    disconnects, reports an error, or does not report back within
+    lease_timeout seconds, the job goes back to the queue. A job that has
+    been leased max_attempts times is given up instead and listed under
+    "failed" in the results, so a game that crashes every worker cannot
+    hold up the tournament. Each job is tallied only once, so a late
+    result of a re-queued job is ignored.
+    """
+
+    def __init__(
+        self,
+        settings: Dict[str, Any],
+        num_games: int = 10,
+        save_moves: bool = False,
+        corpus: Optional[str] = None,
+        seed: Optional[int] = None,
+        address: Tuple[str, int] = (DEFAULT_HOST, DEFAULT_PORT),
+        lease_timeout: float = 600.0,
+        metrics: bool = False,
+        max_attempts: int = 3,
+    ):
+        boards = None
+        if corpus:
+            settings, boards = load_corpus(corpus)
+            num_games = len(boards)
+            print(f"Using corpus {corpus}: {num_games} boards, settings {settings}")
+        self.settings = settings
+        self.save_moves = save_moves
+        self.address = address
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+        self.algos = list(registry.keys())
+        base_seed = seed if seed is not None else random.randrange(2**31)
+        self.jobs = deque()
+        pairings = itertools.permutations(self.algos, 2)
+        for n, ((a1, a2), i) in enumerate(
+            itertools.product(pairings, range(1, num_games + 1))
+        ):
+            self.jobs.append(
+                {
+                    "id": n,
+                    "algo1": a1,
+                    "algo2": a2,
+                    "game_id": i,
+                    "settings": settings,
+                    "board": boards[i - 1] if boards else None,
+                    "seed": base_seed + n,
+                    "record_moves": save_moves,
+                    "metrics": metrics,
+                }
+            )
+        self.total = len(self.jobs)
+        self.leases: Dict[int, Tuple[Dict[str, Any], float, Connection]] = {}
+        self.attempts: Dict[int, int] = {}
+        self.finished = set()
+        self.results = new_results(self.algos)
+        self.results["failed"] = []
+        self.metrics = MetricsRegistry() if metrics else None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.error: Optional[str] = None
+        if not self.total:
+            # No game to wait for (no games, an empty corpus or fewer than
+            # two algorithms): done from the start.
+            self.done.set()
+
+    def _requeue(self, job: Dict[str, Any], reason: str, front: bool = False):
+        """
+        Puts a job whose lease ended without a result back in the queue, or
+        gives it up if it used all its attempts. Called with the lock held.
+        """
+        job_id = job["id"]
+        del self.leases[job_id]
+        if self.attempts[job_id] < self.max_attempts:
+            print(f"{reason}, re-queueing job {job_id}.")
+            if front:
+                self.jobs.appendleft(job)
+            else:
+                self.jobs.append(job)
+            return
+        print(f"{reason}, giving up job {job_id} after {self.max_attempts} attempts.")
+        self.finished.add(job_id)
+        self.results["failed"].append(
+            {
+                "algo1": job["algo1"],
+                "algo2": job["algo2"],
+                "game_id": job["game_id"],
+                "error": reason,
+            }
+        )
+        self._check_done()
+
+    def _check_done(self) -> None:
+        n = len(self.finished)
+        if n % 50 == 0 or n == self.total:
+            print(f"{n}/{self.total} games finished")
+        if n == self.total:
+            self.done.set()
+
+    def _next_job(self, conn: Connection) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            now = time.monotonic()
+            for job_id, (job, deadline, _) in list(self.leases.items()):
+                if now > deadline:
+                    self._requeue(job, f"Lease of job {job_id} expired")
+            while self.jobs:
+                job = self.jobs.popleft()
+                if job["id"] in self.finished:
+                    continue
+                self.leases[job["id"]] = (job, now + self.lease_timeout, conn)
+                self.attempts[job["id"]] = self.attempts.get(job["id"], 0) + 1
+                return job
+            return None
+
+    def _finish(
+        self, job_id: int, winner: int, t1: float, t2: float, moves, grid, metrics
+    ):
+        with self.lock:
+            if job_id in self.finished:
+                return
+            job, _, _ = self.leases.pop(job_id, (None, None, None))
+            if job is None:
+                job = next(j for j in self.jobs if j["id"] == job_id)
+            self.finished.add(job_id)
+            record_result(self.results, job["algo1"], job["algo2"], winner, t1, t2)
+            if self.metrics is not None and metrics:
+                self.metrics.merge(metrics)
+            if self.save_moves:
+                save_move_log(
+                    self.settings,
+                    grid,
+                    job["algo1"],
+                    job["algo2"],
+                    job["game_id"],
+                    moves,
+                )
+            self._check_done()
+
+    def _fail(self, conn: Connection, job_id: int, error: str) -> None:
+        """Handles a job whose game raised on the worker of conn."""
+        with self.lock:
+            lease = self.leases.get(job_id)
+            if lease is not None and lease[2] is conn:
+                self._requeue(lease[0], f"Job {job_id} failed ({error})")
+
+    def _release(self, conn: Connection) -> None:
+        """Re-queues every job leased to a worker that went away."""
+        with self.lock:
+            for job_id, (job, _, owner) in list(self.leases.items()):
+                if owner is conn:
+                    self._requeue(job, "Worker lost", front=True)
+
+    def abort(self, error: str) -> None:
+        """Stops run() before the tournament is finished; run() raises error."""
+        self.error = error
+        self.done.set()
+
+    def _serve_worker(self, conn: Connection) -> None:
+        try:
+            while True:
+                msg = conn.recv()
+                if msg[0] == "get":
+                    if self.done.is_set():
+                        conn.send(("done",))
+                        return
+                    job = self._next_job(conn)
+                    conn.send(("job", job) if job else ("wait", 0.5))
+                elif msg[0] == "result":
+                    self._finish(*msg[1:])
+                elif msg[0] == "error":
+                    self._fail(conn, *msg[1:])
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._release(conn)
+            conn.close()
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Serves jobs until every game is finished and writes the stats JSON.
+        Raises RuntimeError if the coordinator was aborted.
+        """
+        os.makedirs(MOVES_DIR, exist_ok=True)
+        os.makedirs(STATS_DIR, exist_ok=True)
+        print(
+            f"Coordinator on {self.address[0]}:{self.address[1]}: {len(self.algos)} algorithms, {self.total} total games"
+        )
+        listener = Listener(self.address, authkey=AUTHKEY)
+
+        def accept_loop():
+            while not self.done.is_set():
+                try:
+                    conn = listener.accept()
+                except OSError:
+                    return
+                threading.Thread(
+                    target=self._serve_worker, args=(conn,), daemon=True
+                ).start()
+
+        threading.Thread(target=accept_loop, daemon=True).start()
+        self.done.wait()
+        listener.close()
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        if self.metrics is not None:
+            self.results["metrics"] = self.metrics.summary()
+        save_results(self.results)
+        if self.results["failed"]:
+            print(f"{len(self.results['failed'])} games failed and were not scored.")
+        return self.results
+
+
+def run_worker(
+    address: Tuple[str, int] = (DEFAULT_HOST, DEFAULT_PORT), connect_timeout=30.0
+) -> int:
+    """
+    Fetches jobs from a coordinator and plays them with benchmark.play_game
+    until the coordinator reports that the tournament is done. A game that
+    raises is reported to the coordinator as an error.
+    Returns the number of games played.
+    """
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            conn = Client(address, authkey=AUTHKEY)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+    played = 0
+    with conn:
+        while True:
+            try:
+                conn.send(("get",))
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            if msg[0] == "done":
+                break
+            if msg[0] == "wait":
+                time.sleep(msg[1])
+                continue
+            job = msg[1]
+            random.seed(job["seed"])
+            s = job["settings"]
+            game = Game(s["k"], s["x"], s["lower"], s["bound"], board=job["board"])
+            metrics = MetricsRegistry() if job["metrics"] else None
+            try:
+                winner, t1, t2, moves = play_game(
+                    game,
+                    job["algo1"],
+                    job["algo2"],
+                    record_moves=job["record_moves"],
+                    metrics=metrics,
+                )
+            except Exception as e:
+                # Reported so the coordinator re-queues or gives up the job;
+                # the worker goes on with the next one.
+                print(f"Job {job['id']} failed: {e!r}")
+                conn.send(("error", job["id"], repr(e)))
+                continue
+            exported = metrics.export() if metrics is not None else None
+            conn.send(("result", job["id"], winner, t1, t2, moves, game.X, exported))
+            played += 1
+    return played
+
+
+def watch_workers(coordinator: Coordinator, workers: List[subprocess.Popen]) -> None:
+    """Aborts the coordinator if every worker exits before the tournament ends."""
+    while not coordinator.done.wait(1.0):
+        if all(w.poll() is not None for w in workers):
+            coordinator.abort("every local worker exited before the tournament ended")
+            return
+
+
+def spawn_local_workers(count: int, address: Tuple[str, int]) -> List[subprocess.Popen]:
+    """Starts count worker processes on this machine."""
+    return [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-u",
+                os.path.abspath(__file__),
+                "worker",
+                "--host",
+                address[0],
+                "--port",
+                str(address[1]),
+            ]
+        )
+        for _ in range(count)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a round-robin tournament spread over worker processes."
+    )
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coord = sub.add_parser("coordinator", help="Serve the tournament's games.")
+    coord.add_argument(
+        "--config", required=False, help="JSON config as for benchmark.py."
+    )
+    coord.add_argument("--corpus", required=False, help="Board corpus (.npz) to play.")
+    coord.add_argument("--seed", type=int, default=None, help="Base seed of the jobs.")
+    coord.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=600.0,
+        help="Seconds after which an unreported job is handed to another worker.",
+    )
+    coord.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Times a job is handed out before it is given up.",
+    )
+    coord.add_argument(
+        "--local-workers",
+        type=int,
+        default=0,
+        help="Also start this many workers on this machine.",
+    )
+    coord.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Record per-move latency distributions and throughput.",
+    )
+
+    work = sub.add_parser("worker", help="Play games served by a coordinator.")
+
+    for p in (coord, work):
+        p.add_argument("--host", default=DEFAULT_HOST)
+        p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    address = (args.host, args.port)
+    if not is_loopback(args.host) and AUTHKEY_ENV not in os.environ:
+        parser.error(
+            f"--host {args.host} is not a loopback address: set a secret "
+            f"{AUTHKEY_ENV} (the same on every machine) to use it."
+        )
+
+    if args.role == "worker":
+        played = run_worker(address)
+        print(f"Worker finished after {played} games.")
+        sys.exit(0)
+
+    cfg = {
+        "k": 4,
+        "x": 30,
+        "lower": 1,
+        "bound": 100,
+        "num_games": 10,
+        "save_moves": False,
+        "corpus": None,
+        "metrics": False,
+    }
+    if args.config:
+        with open(args.config) as f:
+            cfg.update(json.load(f))
+    if args.corpus:
+        cfg["corpus"] = args.corpus
+    if args.metrics:
+        cfg["metrics"] = True
+
+    coordinator = Coordinator(
+        settings={
+            "k": cfg["k"],
+            "x": cfg["x"],
+            "lower": cfg["lower"],
+            "bound": cfg["bound"],
+        },
+        num_games=cfg["num_games"],
+        save_moves=cfg["save_moves"],
+        corpus=cfg["corpus"],
+        seed=args.seed,
+        address=address,
+        lease_timeout=args.lease_timeout,
+        metrics=cfg["metrics"],
+        max_attempts=args.max_attempts,
+    )
+    workers = (
+        spawn_local_workers(args.local_workers, address) if coordinator.total else []
+    )
+    if workers:
+        threading.Thread(
+            target=watch_workers, args=(coordinator, workers), daemon=True
+        ).start()
+    try:
+        coordinator.run()
+    except RuntimeError as e:
+        sys.exit(f"Coordinator stopped: {e}")
+    finally:
+        for w in workers:
+            try:
+                w.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                w.kill()
+                w.wait()
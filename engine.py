@@ -0,0 +1,92 @@
+from typing import Dict, List, Optional, Set
+
+from utils import generate_random_subset_with_progression
+from symmetry import canonical_aps
+import tracing
+
+# The rules of the game, with no dependency on pygame: headless code
+# (tournaments, workers, benchmarks) imports Game from here, and the pygame
+# UI in game.py is built on top of it.
+
+
+class Game:
+    def __init__(self, k, x, lower, bound, board=None):
+        """
+        :param board: optional precomputed (X, forced_prog, all_possible) triple,
+                      e.g. drawn from a corpus; when given, no new set is
+                      generated and the progressions are not re-enumerated.
+        """
+        self.k: int = k
+        self.x: int = x
+        self.lower: int = lower
+        self.bound: int = bound
+
+        if board is not None:
+            X, forced_prog, all_possible = board
+            self.X: List[int] = list(X)
+            self.forced_prog: List[int] = list(forced_prog)
+            self.all_possible: List[List[int]] = [list(ap) for ap in all_possible]
+        else:
+            try:
+                self.X, self.forced_prog = generate_random_subset_with_progression(
+                    k, x, lower, bound
+                )
+            except Exception as e:
+                print("Error generating set:", e)
+
+            self.all_possible: List[List[int]] = canonical_aps(k, self.X)
+        if not self.all_possible:
+            print(
+                "No arithmetic progression of length",
+                k,
+                "found with the given settings.",
+            )
+
+        self.player1_moves: List[int] = []
+        self.player2_moves: List[int] = []
+
+        self.game_over: bool = False
+        self.winner: Optional[int] = None
+        self.player1_turn: bool = True
+        self.turn_count: int = 1
+        self.winning_progression = None
+        self.available_numbers: Set[int] = set(self.X)
+
+        # Live progressions: a progression is live for a player while the
+        # other player holds none of its numbers. held[p][i] counts player
+        # p + 1's numbers in all_possible[i] and live[p] the progressions
+        # live for player p + 1, so a move only touches the progressions
+        # through the number taken. Once neither player has a live
+        # progression left nobody can win, and the game is drawn.
+        self.aps_of: Dict[int, List[int]] = {n: [] for n in self.X}
+        for i, ap in enumerate(self.all_possible):
+            for n in ap:
+                self.aps_of[n].append(i)
+        self.held: List[List[int]] = [[0] * len(self.all_possible) for _ in range(2)]
+        self.live: List[int] = [len(self.all_possible)] * 2
+
+    @tracing.traced("Game.make_move")
+    def make_move(self, value):
+        player_moves = self.player1_moves if self.player1_turn else self.player2_moves
+        player_moves.append(value)
+        self.available_numbers.remove(value)
+
+        player = 0 if self.player1_turn else 1
+        own = self.held[player]
+        for i in self.aps_of[value]:
+            own[i] += 1
+            if own[i] == self.k:
+                self.winner = player + 1
+                self.game_over = True
+                self.winning_progression = self.all_possible[i]
+                return
+            if own[i] == 1:
+                # No longer live for the other player.
+                self.live[1 - player] -= 1
+
+        if not self.available_numbers or not any(self.live):
+            self.game_over = True
+            return
+
+        self.player1_turn = not self.player1_turn
+        self.turn_count += 1
@@ -0,0 +1,380 @@
+import os
+import time
+import argparse
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+from symmetry import canonical_aps
+
+# Setting this environment variable to a model path loads it at import time,
+# e.g. in tournament workers; otherwise mcts_learned uses Evaluator.default.
+EVALUATOR_ENV = "SZEMEREDI_EVALUATOR"
+MODEL_DIR = "models"
+
+
+# Features
+#
+# Everything is seen from the player to move ("mover"). A progression is
+# live for a player while the other player holds none of its numbers, and
+# its threat level is how many of its numbers that player already holds.
+# Per number: for the mover and for the opponent, how many live
+# progressions of each threat level 0..k-1 go through it (2k features; a
+# mover's progression at level k-1 through a free number wins at once).
+# Per position: the number of live progressions of each player at each
+# level and the share of numbers still free (2k + 1 features).
+
+
+def incidence(aps: np.ndarray, x: int) -> np.ndarray:
+    """(x, #APs) 0/1 matrix: which progressions each column is on."""
+    matrix = np.zeros((x, len(aps)), dtype=np.float32)
+    for m, ap in enumerate(aps):
+        matrix[ap, m] = 1.0
+    return matrix
+
+
+def features(
+    owner: np.ndarray, aps: np.ndarray, on_aps: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (move features (B, x, 2k), position features (B, 2k + 1)) of a batch of
+    positions on one board. owner is (B, x) with 1 for the mover's numbers,
+    -1 for the opponent's and 0 for free ones; aps is the (#APs, k) matrix
+    of the progressions' columns and on_aps its incidence().
+    """
+    in_aps = owner[:, aps]  # (B, #APs, k)
+    held = ((in_aps == 1).sum(axis=2), (in_aps == -1).sum(axis=2))
+    levels = np.arange(k)
+    cells, counts = [], []
+    for side in (0, 1):
+        live = held[1 - side] == 0
+        # (B, #APs, k): progression live for side at each threat level
+        threat = (live[:, :, None] & (held[side][:, :, None] == levels)).astype(
+            np.float32
+        )
+        cells.append(np.einsum("xm,bmj->bxj", on_aps, threat))
+        counts.append(threat.sum(axis=1))
+    free = (owner == 0).mean(axis=1, dtype=np.float32)[:, None]
+    move = np.log1p(np.concatenate(cells, axis=2))
+    position = np.concatenate([np.log1p(np.concatenate(counts, axis=1)), free], 1)
+    return move, position
+
+
+class BoardFeatures:
+    """A board's progressions as column matrices, for features()."""
+
+    def __init__(self, numbers: Iterable[int], aps: Iterable[Iterable[int]], k: int):
+        self.numbers = sorted(numbers)
+        self.column = {n: c for c, n in enumerate(self.numbers)}
+        self.k = k
+        self.aps = np.array(
+            [sorted(self.column[n] for n in ap) for ap in aps], dtype=np.intp
+        ).reshape(-1, k)
+        self.on_aps = incidence(self.aps, len(self.numbers))
+
+    def owner(self, mover: Iterable[int], opponent: Iterable[int]) -> np.ndarray:
+        owner = np.zeros((1, len(self.numbers)), dtype=np.int8)
+        owner[0, [self.column[n] for n in mover]] = 1
+        owner[0, [self.column[n] for n in opponent]] = -1
+        return owner
+
+    def features(self, owner: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return features(owner, self.aps, self.on_aps, self.k)
+
+
+# Model
+
+
+def mlp(params: Dict[str, np.ndarray], head: str, x: np.ndarray) -> List[np.ndarray]:
+    """Activations of a head's layers, input first; tanh between layers."""
+    acts = [x]
+    layers = sum(1 for name in params if name.startswith(f"{head}_W"))
+    for i in range(layers):
+        z = acts[-1] @ params[f"{head}_W{i}"] + params[f"{head}_b{i}"]
+        acts.append(np.tanh(z) if i < layers - 1 else z)
+    return acts
+
+
+def mlp_grads(
+    params: Dict[str, np.ndarray], head: str, acts: List[np.ndarray], dout: np.ndarray
+) -> Dict[str, np.ndarray]:
+    grads = {}
+    layers = len(acts) - 1
+    delta = dout
+    for i in reversed(range(layers)):
+        grads[f"{head}_W{i}"] = acts[i].T @ delta
+        grads[f"{head}_b{i}"] = delta.sum(axis=0)
+        if i:
+            delta = (delta @ params[f"{head}_W{i}"].T) * (1 - acts[i] ** 2)
+    return grads
+
+
+class Evaluator:
+    """
+    Policy/value model over the features above: the same small network
+    scores every free number (softmax over the free numbers gives the
+    policy), and another maps the position to the mover's expected result
+    (sigmoid). hidden=0 makes both linear.
+    """
+
+    def __init__(self, k: int, hidden: int = 16, seed: Optional[int] = None):
+        self.k = k
+        self.hidden = hidden
+        rng = np.random.default_rng(seed)
+        self.params: Dict[str, np.ndarray] = {}
+        for head, inputs in (("policy", 2 * k), ("value", 2 * k + 1)):
+            sizes = [inputs, hidden, 1] if hidden else [inputs, 1]
+            for i, (n_in, n_out) in enumerate(zip(sizes, sizes[1:])):
+                self.params[f"{head}_W{i}"] = (
+                    rng.standard_normal((n_in, n_out)) / np.sqrt(n_in)
+                ).astype(np.float32)
+                self.params[f"{head}_b{i}"] = np.zeros(n_out, dtype=np.float32)
+
+    @classmethod
+    def default(cls, k: int) -> "Evaluator":
+        """
+        Hand-set linear model used until one is trained: prefer numbers on
+        many advanced live progressions, completing one above all and then
+        blocking the opponent's; value the position by the same counts.
+        """
+        model = cls(k, hidden=0)
+        levels = np.arange(k, dtype=np.float32)
+        own, other = 0.5 * levels, 0.4 * levels
+        own[-1], other[-1] = 8.0, 5.0
+        model.params["policy_W0"] = np.concatenate([own, other])[:, None]
+        own, other = 0.3 * levels, -0.3 * levels
+        own[-1], other[-1] = 4.0, -1.0
+        model.params["value_W0"] = np.concatenate([own, other, [0.0]])[:, None]
+        model.params["value_W0"] = model.params["value_W0"].astype(np.float32)
+        return model
+
+    def forward(
+        self, move: np.ndarray, position: np.ndarray, free: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, Tuple[List[np.ndarray], List[np.ndarray]]]:
+        """(policy (B, x), value (B,), activations for backward)."""
+        b, x, f = move.shape
+        policy_acts = mlp(self.params, "policy", move.reshape(b * x, f))
+        logits = np.where(free, policy_acts[-1].reshape(b, x), -np.inf)
+        logits -= logits.max(axis=1, keepdims=True)
+        policy = np.exp(logits)
+        policy /= policy.sum(axis=1, keepdims=True)
+        value_acts = mlp(self.params, "value", position)
+        value = 1 / (1 + np.exp(-value_acts[-1][:, 0]))
+        return policy, value, (policy_acts, value_acts)
+
+    def backward(
+        self,
+        policy: np.ndarray,
+        value: np.ndarray,
+        acts: Tuple[List[np.ndarray], List[np.ndarray]],
+        policy_target: np.ndarray,
+        value_target: np.ndarray,
+    ) -> Tuple[Dict[str, np.ndarray], float, float]:
+        """Gradients of the mean policy cross-entropy plus value binary
+        cross-entropy, and the two losses."""
+        b = len(value)
+        policy_loss = -np.sum(policy_target * np.log(np.maximum(policy, 1e-12))) / b
+        v = np.clip(value, 1e-7, 1 - 1e-7)
+        value_loss = -np.mean(
+            value_target * np.log(v) + (1 - value_target) * np.log(1 - v)
+        )
+        grads = mlp_grads(
+            self.params,
+            "policy",
+            acts[0],
+            ((policy - policy_target) / b).reshape(-1, 1),
+        )
+        grads.update(
+            mlp_grads(
+                self.params, "value", acts[1], ((value - value_target) / b)[:, None]
+            )
+        )
+        return grads, float(policy_loss), float(value_loss)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, k=self.k, hidden=self.hidden, **self.params)
+
+    @classmethod
+    def load(cls, path: str) -> "Evaluator":
+        with np.load(path) as data:
+            model = cls(int(data["k"]), hidden=int(data["hidden"]))
+            model.params = {name: data[name] for name in model.params}
+        return model
+
+
+class BoardEvaluator:
+    """
+    Evaluates positions of one board with a model; what LearnedNode calls.
+    Any object with the same evaluate() can stand in for it.
+    """
+
+    def __init__(self, model: Evaluator, board: BoardFeatures):
+        self.model = model
+        self.board = board
+
+    def evaluate(
+        self, mover: List[int], opponent: List[int]
+    ) -> Tuple[Dict[int, float], float]:
+        """(probability of each free number, expected result for the mover)."""
+        owner = self.board.owner(mover, opponent)
+        move, position = self.board.features(owner)
+        policy, value, _ = self.model.forward(move, position, owner == 0)
+        numbers = self.board.numbers
+        return (
+            {numbers[c]: float(p) for c, p in enumerate(policy[0]) if owner[0, c] == 0},
+            float(value[0]),
+        )
+
+
+_model: Optional[Evaluator] = None
+_defaults: Dict[int, Evaluator] = {}
+
+
+def load(path: Optional[str]) -> Optional[Evaluator]:
+    """Makes path the model model() returns; None goes back to the default."""
+    global _model
+    _model = Evaluator.load(path) if path else None
+    return _model
+
+
+def model(k: int) -> Evaluator:
+    """The loaded model if it was trained for k, else the default one."""
+    if _model is not None and _model.k == k:
+        return _model
+    if k not in _defaults:
+        _defaults[k] = Evaluator.default(k)
+    return _defaults[k]
+
+
+def board_evaluator(
+    numbers: Iterable[int], aps: Iterable[Iterable[int]], k: int
+) -> BoardEvaluator:
+    return BoardEvaluator(model(k), BoardFeatures(numbers, aps, k))
+
+
+# Training
+
+
+def batch_features(
+    batch: Dict[str, np.ndarray], k: int, boards: Dict[Tuple[int, ...], BoardFeatures]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Features of a mini-batch from selfplay.ShardReader, whose positions
+    may come from different boards; boards caches each board's matrices."""
+    b, x = batch["owner"].shape
+    move = np.empty((b, x, 2 * k), dtype=np.float32)
+    position = np.empty((b, 2 * k + 1), dtype=np.float32)
+    keys, index = np.unique(batch["board"], axis=0, return_inverse=True)
+    for i, key in enumerate(keys):
+        key = tuple(int(n) for n in key)
+        if key not in boards:
+            boards[key] = BoardFeatures(key, canonical_aps(k, list(key)), k)
+        rows = np.flatnonzero(index.ravel() == i)
+        move[rows], position[rows] = boards[key].features(batch["owner"][rows])
+    return move, position
+
+
+def targets(batch: Dict[str, np.ndarray]) -> np.ndarray:
+    """MCTS visit shares where recorded, else the move played."""
+    b, x = batch["owner"].shape
+    played = np.zeros((b, x), dtype=np.float32)
+    played[np.arange(b), batch["move"]] = 1.0
+    return np.where(batch["has_policy"][:, None], batch["policy"], played)
+
+
+def train(
+    directory: str,
+    hidden: int = 16,
+    epochs: int = 5,
+    batch_size: int = 256,
+    lr: float = 0.01,
+    seed: Optional[int] = None,
+) -> Evaluator:
+    """
+    Trains a model on a self-play directory (see selfplay.py) with Adam.
+    Prints the losses of every epoch and the move-prediction accuracy.
+    """
+    # Imported here: selfplay pulls in the tournament code.
+    from selfplay import ShardReader
+
+    reader = ShardReader(directory)
+    k = reader.k
+    net = Evaluator(k, hidden=hidden, seed=seed)
+    boards: Dict[Tuple[int, ...], BoardFeatures] = {}
+    m = {name: np.zeros_like(p) for name, p in net.params.items()}
+    v = {name: np.zeros_like(p) for name, p in net.params.items()}
+    beta1, beta2, eps, step = 0.9, 0.999, 1e-8, 0
+    fields = ["board", "owner", "policy", "has_policy", "move", "outcome"]
+    print(f"Training on {len(reader)} positions of {directory}")
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        totals = np.zeros(3)
+        rows = 0
+        for batch in reader.batches(
+            batch_size,
+            fields,
+            shuffle=True,
+            seed=None if seed is None else seed + epoch,
+        ):
+            move, position = batch_features(batch, k, boards)
+            policy, value, acts = net.forward(move, position, batch["owner"] == 0)
+            grads, policy_loss, value_loss = net.backward(
+                policy, value, acts, targets(batch), batch["outcome"]
+            )
+            step += 1
+            for name, g in grads.items():
+                m[name] = beta1 * m[name] + (1 - beta1) * g
+                v[name] = beta2 * v[name] + (1 - beta2) * g * g
+                m_hat = m[name] / (1 - beta1**step)
+                v_hat = v[name] / (1 - beta2**step)
+                net.params[name] -= (lr * m_hat / (np.sqrt(v_hat) + eps)).astype(
+                    np.float32
+                )
+            n = len(value)
+            accuracy = np.mean(policy.argmax(axis=1) == batch["move"])
+            totals += np.array([policy_loss, value_loss, accuracy]) * n
+            rows += n
+        policy_loss, value_loss, accuracy = totals / max(rows, 1)
+        print(
+            f"epoch {epoch + 1}: policy loss {policy_loss:.3f}, value loss "
+            f"{value_loss:.3f}, move accuracy {accuracy:.1%} "
+            f"({time.perf_counter() - start:.1f}s)"
+        )
+    return net
+
+
+if os.environ.get(EVALUATOR_ENV):
+    load(os.environ[EVALUATOR_ENV])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Train the policy/value model of mcts_learned on self-play data."
+    )
+    parser.add_argument(
+        "--data", default="selfplay", help="Self-play directory (from selfplay.py)."
+    )
+    parser.add_argument(
+        "--hidden", type=int, default=16, help="Hidden units (0 for linear models)."
+    )
+    parser.add_argument("--epochs", type=int, default=5, help="Passes over the data.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Mini-batch size.")
+    parser.add_argument("--lr", type=float, default=0.01, help="Adam learning rate.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+    parser.add_argument(
+        "--out",
+        default=os.path.join(MODEL_DIR, "evaluator.npz"),
+        help=f"Output path (default: {MODEL_DIR}/evaluator.npz).",
+    )
+    args = parser.parse_args()
+
+    net = train(
+        args.data,
+        hidden=args.hidden,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        lr=args.lr,
+        seed=args.seed,
+    )
+    net.save(args.out)
+    print(f"Saved model to {args.out}")
@@ -1,10 +1,10 @@
-import pygame, sys, math
+import pygame, sys, time, threading
 from typing import List, Dict, Any, Set, Optional
-from utils import (
-    find_all_arithmetic_progressions,
-    generate_random_subset_with_progression,
-)
-from algorithms import registry
+from engine import Game
+from algorithms import registry, ponder_registry
+from algorithms.control import SearchControl, use_control
+from renderer import BoardRenderer, render_text
+import tracing
 
 BLACK: tuple[int, int, int] = (0, 0, 0)
 WHITE: tuple[int, int, int] = (255, 255, 255)
@@ -20,14 +20,81 @@ def draw_text_with_outline(
     text_color: tuple[int, int, int] = WHITE,
     outline_color: tuple[int, int, int] = BLACK,
 ) -> None:
-    txt = font.render(text, True, text_color)
-    outline = font.render(text, True, outline_color)
-    for dx in (-1, 0, 1):
-        for dy in (-1, 0, 1):
-            if dx or dy:
-                pos = (center[0] + dx, center[1] + dy)
-                screen.blit(outline, outline.get_rect(center=pos))
-    screen.blit(txt, txt.get_rect(center=center))
+    surf = render_text(font, text, text_color, outline_color)
+    screen.blit(surf, surf.get_rect(center=center))
+
+
+def format_search_stats(stats: Dict[str, Any]) -> str:
+    """One-line summary of the computer's last search."""
+    if stats.get("book"):
+        return (
+            f"book move ({stats['book_visits']} visits, "
+            f"value {stats['book_value']:.2f})"
+        )
+    if stats.get("solved"):
+        outcome = {1.0: "win", 0.5: "draw", 0.0: "loss"}[stats["solved_value"]]
+        return f"solved position ({outcome})"
+    text = (
+        f"{stats['simulations']} sims, {stats['simulations_per_sec'] / 1000:.1f}k/s, "
+        f"depth {stats['avg_depth']:.1f}/{stats['max_depth']}, "
+        f"{stats['nodes_allocated']} nodes"
+    )
+    if stats.get("root_visits"):
+        move, visits, _ = stats["root_visits"][0]
+        text += f", best {move} ({visits / stats['simulations']:.0%})"
+    if "reused" in stats:
+        text += f", reused {stats['reused_visits']}"
+    if stats.get("nodes_pruned"):
+        text += f", pruned {stats['nodes_pruned']} to {stats['tree_size']}"
+    return text
+
+
+class BackgroundMove:
+    """
+    One choose_move (or ponder) call of the computer, run on a daemon thread
+    so that the window keeps repainting while it searches. MCTS searches
+    report their progress through .control and stop early when cancel() is
+    called.
+    """
+
+    def __init__(
+        self, algorithm, available, own, opponent, k, label="Computer thinking"
+    ):
+        self.label = label
+        self.control = SearchControl()
+        self.start = time.perf_counter()
+        self.move: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(
+            target=self._run, args=(algorithm, available, own, opponent, k), daemon=True
+        )
+        self.thread.start()
+
+    def _run(self, algorithm, available, own, opponent, k) -> None:
+        try:
+            with use_control(self.control):
+                self.move = algorithm(available, own, opponent, k)
+        except BaseException as e:
+            self.error = e
+
+    def done(self) -> bool:
+        return not self.thread.is_alive()
+
+    def result(self) -> int:
+        if self.error is not None:
+            raise self.error
+        return self.move
+
+    def cancel(self) -> None:
+        self.control.cancel()
+        self.thread.join(timeout=1)
+
+    def progress_text(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        text = f"{self.label}... {elapsed:.1f}s"
+        if self.control.simulations:
+            text += f", {self.control.simulations} sims"
+        return text
 
 
 def show_all_progressions_screen(
@@ -35,15 +102,9 @@ def show_all_progressions_screen(
 ) -> None:
     clock = pygame.time.Clock()
     back_button = pygame.Rect(350, 530, 100, 40)
-    running = True
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if back_button.collidepoint(event.pos):
-                    running = False
+
+    # The screen is static: draw it once and only redraw when exposed.
+    def draw() -> None:
         screen.fill((40, 40, 40))
         title = font.render("All Winning APs:", True, WHITE)
         screen.blit(title, (50, 20))
@@ -59,6 +120,19 @@ def show_all_progressions_screen(
         pygame.draw.rect(screen, (200, 0, 0), back_button)
         draw_text_with_outline(screen, "Back", font, back_button.center)
         pygame.display.flip()
+
+    draw()
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.WINDOWEXPOSED:
+                draw()
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if back_button.collidepoint(event.pos):
+                    running = False
         clock.tick(30)
 
 
@@ -74,18 +148,10 @@ def end_game_screen(
     play_button = pygame.Rect(150, 500, 120, 50)
     menu_button = pygame.Rect(330, 500, 120, 50)
     show_ap_button = pygame.Rect(510, 500, 220, 50)
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if play_button.collidepoint(event.pos):
-                    return "play_again"
-                if menu_button.collidepoint(event.pos):
-                    return "main_menu"
-                if show_ap_button.collidepoint(event.pos):
-                    show_all_progressions_screen(screen, font, all_progs)
+
+    # The screen is static: draw it once and only redraw when exposed or
+    # after the list of APs was shown over it.
+    def draw() -> None:
         screen.fill((30, 30, 30))
         msg = f"{winner} wins!" if winner else "Draw!"
         draw_text_with_outline(screen, msg, font, (400, 80))
@@ -112,60 +178,24 @@ def end_game_screen(
         turn_info = font.render("Game Over", True, WHITE)
         screen.blit(turn_info, (10, 10))
         pygame.display.flip()
-        clock.tick(30)
-
-
-class Game:
-    def __init__(self, k, x, lower, bound):
-        self.k: int = k
-        self.x: int = x
-        self.lower: int = lower
-        self.bound: int = bound
-
-        try:
-            self.X, self.forced_prog = generate_random_subset_with_progression(
-                k, x, lower, bound
-            )
-        except Exception as e:
-            print("Error generating set:", e)
-
-        self.all_possible: List[List[int]] = find_all_arithmetic_progressions(k, self.X)
-        if not self.all_possible:
-            print(
-                "No arithmetic progression of length",
-                k,
-                "found with the given settings.",
-            )
-
-        self.player1_moves: List[int] = []
-        self.player2_moves: List[int] = []
-
-        self.game_over: bool = False
-        self.winner: Optional[int] = None
-        self.player1_turn: bool = True
-        self.turn_count: int = 1
-        self.winning_progression = None
-        self.available_numbers: Set[int] = set(self.X)
-
-    def make_move(self, value):
-        player_moves = self.player1_moves if self.player1_turn else self.player2_moves
-        player_moves.append(value)
-        self.available_numbers.remove(value)
-
-        player_moves_set = set(player_moves)
-        for ap in self.all_possible:
-            if set(ap).issubset(player_moves_set):
-                self.winner = 1 if self.player1_turn else 2
-                self.game_over = True
-                self.winning_progression = ap
-                return
-
-        if not self.available_numbers:
-            self.game_over = True
-            return
 
-        self.player1_turn = not self.player1_turn
-        self.turn_count += 1
+    draw()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.WINDOWEXPOSED:
+                draw()
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if play_button.collidepoint(event.pos):
+                    return "play_again"
+                if menu_button.collidepoint(event.pos):
+                    return "main_menu"
+                if show_ap_button.collidepoint(event.pos):
+                    show_all_progressions_screen(screen, font, all_progs)
+                    draw()
+        clock.tick(30)
 
 
 def run_game(settings: Dict[str, Any]) -> None:
@@ -176,6 +206,8 @@ def run_game(settings: Dict[str, Any]) -> None:
     ai_choice: str = settings.get("algorithm", "random")
     # Retrieve the algorithm function that accepts four parameters.
     ai_algorithm = registry.get(ai_choice.lower(), registry.get("random"))
+    # Searches the computer's tree on the player's turn, if the algorithm can.
+    ai_ponder = ponder_registry.get(ai_choice.lower())
     game = Game(k, x, lower, bound)
 
     pygame.init()
@@ -190,95 +222,136 @@ def run_game(settings: Dict[str, Any]) -> None:
     right_margin: int = 20
     top_margin: int = 80
     bottom_margin: int = 20
-    cols: int = int(math.ceil(x**0.5))
-    rows: int = int(math.ceil(x / cols))
-    cell_width: float = (screen_width - left_margin - right_margin) / cols
-    cell_height: float = (screen_height - top_margin - bottom_margin) / rows
-    radius: int = int(min(cell_width, cell_height) / 2 * 0.8)
-    cells: List[Dict[str, Any]] = []
-    for index in range(x):
-        row: int = index // cols
-        col: int = index % cols
-        cx: float = left_margin + col * cell_width + cell_width / 2
-        cy: float = top_margin + row * cell_height + cell_height / 2
-        rect: pygame.Rect = pygame.Rect(
-            int(cx - radius), int(cy - radius), 2 * radius, 2 * radius
-        )
-        cell: Dict[str, Any] = {
-            "value": game.X[index],
-            "center": (int(cx), int(cy)),
-            "rect": rect,
-            "color": BLACK,
-        }
-        cells.append(cell)
+    board_area = pygame.Rect(
+        left_margin,
+        top_margin,
+        screen_width - left_margin - right_margin,
+        screen_height - top_margin - bottom_margin,
+    )
+    # Large boards scroll and zoom; the renderer only draws what is visible.
+    renderer = BoardRenderer(screen, game.X, board_area, font)
+    index_of: Dict[int, int] = {value: i for i, value in enumerate(game.X)}
 
     player_first: bool = settings.get("first", "player").lower() == "player"
+    search_stats: Dict[str, Any] = {}
+    pending: Optional[BackgroundMove] = None
+    pondering: Optional[BackgroundMove] = None
     while not game.game_over:
         player_turn = game.player1_turn == player_first
+        if player_first:
+            computer_moves: List[int] = game.player2_moves
+            player_moves: List[int] = game.player1_moves
+        else:
+            computer_moves: List[int] = game.player1_moves
+            player_moves: List[int] = game.player2_moves
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                for search in (pending, pondering):
+                    if search is not None:
+                        search.cancel()
                 pygame.quit()
                 sys.exit()
 
-            if player_turn and event.type == pygame.MOUSEBUTTONDOWN:
-                pos = pygame.mouse.get_pos()
-                for i in available_indices.copy():
-                    cell = cells[i]
-                    if cell["rect"].collidepoint(pos):
-                        cell["color"] = PLAYER_COLOR
-                        available_indices.remove(i)
-                        game.make_move(cell["value"])
-                        break
-
-            if not player_turn and not game.game_over:
-                if available_indices:
-                    if game.player1_turn:
-                        computer_moves: List[int] = game.player1_moves
-                        player_moves: List[int] = game.player2_moves
-                    else:
-                        computer_moves: List[int] = game.player2_moves
-                        player_moves: List[int] = game.player1_moves
-
-                    chosen_number: int = ai_algorithm(
-                        list(game.available_numbers),
-                        computer_moves,
-                        player_moves,
-                        game.k,
-                    )
-                    chosen_index: Optional[int] = None
-                    for idx in available_indices:
-                        if cells[idx]["value"] == chosen_number:
-                            chosen_index = idx
-                            break
-                    if chosen_index is None:
-                        chosen_index = available_indices.pop()
-                    else:
-                        available_indices.remove(chosen_index)
-                    cell = cells[chosen_index]
-                    cell["color"] = COMPUTER_COLOR
-                    game.make_move(chosen_number)
-
-        screen.fill(WHITE)
-        for cell in cells:
-            pygame.draw.circle(screen, cell["color"], cell["center"], radius)
-            pygame.draw.circle(screen, BLACK, cell["center"], radius, 2)
-            draw_text_with_outline(screen, str(cell["value"]), font, cell["center"])
-
-        winner = "Player" if player_turn else "Computer"
-        turn_text: str = f"Turn: {winner}"
-        count_text: str = f"Turn Number: {game.turn_count}"
-        turn_surf = font.render(turn_text, True, BLACK)
-        count_surf = font.render(count_text, True, BLACK)
-        screen.blit(turn_surf, (10, 10))
-        screen.blit(count_surf, (10, 40))
-        pygame.display.flip()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                # Back to the menu, abandoning the game.
+                for search in (pending, pondering):
+                    if search is not None:
+                        search.cancel()
+                tracing.save()
+                pygame.quit()
+                return
+
+            if event.type == pygame.WINDOWEXPOSED:
+                renderer.invalidate()
+
+            if renderer.handle_event(event):
+                continue
+
+            if (
+                player_turn
+                and event.type == pygame.MOUSEBUTTONDOWN
+                and event.button == 1
+            ):
+                i = renderer.cell_at(event.pos)
+                if i is not None and i in available_indices:
+                    # The tree must not change under the computer's move.
+                    if pondering is not None:
+                        pondering.cancel()
+                        pondering = None
+                    renderer.set_color(i, PLAYER_COLOR)
+                    available_indices.remove(i)
+                    game.make_move(game.X[i])
+
+        if (
+            game.player1_turn == player_first
+            and ai_ponder is not None
+            and pondering is None
+            and not game.game_over
+            and computer_moves
+        ):
+            pondering = BackgroundMove(
+                ai_ponder,
+                list(game.available_numbers),
+                list(computer_moves),
+                list(player_moves),
+                game.k,
+                label="Pondering",
+            )
+
+        if not player_turn and not game.game_over and available_indices:
+            if pending is None:
+                pending = BackgroundMove(
+                    ai_algorithm,
+                    list(game.available_numbers),
+                    list(computer_moves),
+                    list(player_moves),
+                    game.k,
+                )
+            elif pending.done():
+                chosen_number: int = pending.result()
+                search_stats = pending.control.stats
+                pending = None
+                chosen_index: Optional[int] = index_of.get(chosen_number)
+                if chosen_index not in available_indices:
+                    chosen_index = available_indices.pop()
+                else:
+                    available_indices.remove(chosen_index)
+                renderer.set_color(chosen_index, COMPUTER_COLOR)
+                game.make_move(chosen_number)
+
+        turn = "Player" if player_turn else "Computer"
+        renderer.set_text("turn", f"Turn: {turn}", font, topleft=(10, 10))
+        renderer.set_text(
+            "count", f"Turn Number: {game.turn_count}", font, topleft=(10, 40)
+        )
+        if search_stats:
+            renderer.set_text(
+                "stats",
+                format_search_stats(search_stats),
+                font,
+                topright=(screen_width - 10, 10),
+            )
+        search = pending or pondering
+        renderer.set_text(
+            "progress",
+            search.progress_text() if search is not None else None,
+            font,
+            topright=(screen_width - 10, 40),
+        )
+        renderer.update()
         clock.tick(30)
 
     win_prog = game.winning_progression
+    # None for a draw, including a dead position ended early.
+    winner: Optional[str] = None
+    if game.winner is not None:
+        winner = "Player" if (game.winner == 1) == player_first else "Computer"
 
     if game.forced_prog in game.all_possible:
         game.all_possible.remove(game.forced_prog)
 
+    tracing.save()
     result: str = end_game_screen(
         screen, font, winner, game.forced_prog, game.all_possible, win_prog
     )
@@ -1,11 +1,14 @@
 import os
 import sys
+import argparse
 import subprocess
 import pygame
+import tracing
 from algorithms import registry
 
 CONFIG_DIR = "experiments_configs"
 MOVES_DIR = "saved_runs_moves"
+TRACE_FILE = os.path.join("traces", "game_trace.json")
 
 
 def settings_screen() -> dict:
@@ -232,6 +235,16 @@ def settings_screen() -> dict:
                             0, min(max_off, db["scroll_offset"] - event.y * option_h)
                         )
 
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                if tracing.is_enabled():
+                    saved = tracing.save()
+                    tracing.disable()
+                    error_msg = f"Tracing off, saved to {saved}"
+                else:
+                    tracing.enable(TRACE_FILE)
+                    error_msg = f"Tracing on, writing to {TRACE_FILE}"
+                error_timer = pygame.time.get_ticks()
+
             if event.type == pygame.KEYDOWN and active_box:
                 if event.key == pygame.K_RETURN:
                     active_box = None
@@ -363,6 +376,12 @@ def settings_screen() -> dict:
             ),
         )
 
+        trace_state = "on" if tracing.is_enabled() else "off"
+        screen.blit(
+            font.render(f"F9: tracing {trace_state}", True, (150, 150, 150)),
+            (20, 610),
+        )
+
         # Error message
         if error_msg:
             screen.blit(
@@ -387,6 +406,16 @@ def settings_screen() -> dict:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Szemerédi's Game.")
+    parser.add_argument(
+        "--trace",
+        required=False,
+        help="Write a Chrome trace (open in Perfetto) of the session to this path.",
+    )
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
+
     while True:
         settings = settings_screen()
         from game import run_game
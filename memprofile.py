@@ -0,0 +1,202 @@
+import gc
+import os
+import time
+import _thread
+import threading
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Callable
+
+MB = 1024 * 1024
+
+
+class MemoryCeilingExceeded(Exception):
+    """Raised when an algorithm's memory goes over the profiler's ceiling."""
+
+    def __init__(self, algo: str, used: int, ceiling: int):
+        super().__init__(
+            f"{algo} used {used / MB:.1f} MB (ceiling {ceiling / MB:.1f} MB)"
+        )
+        self.algo = algo
+        self.used = used
+        self.ceiling = ceiling
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process (Linux /proc)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _stats(values: List[int]) -> Dict[str, float]:
+    return {
+        "mean": sum(values) / len(values) / MB if values else 0.0,
+        "max": max(values) / MB if values else 0.0,
+    }
+
+
+class MemoryProfiler:
+    """
+    Per-move and per-game memory accounting for play_game.
+
+    mode="tracemalloc" measures Python allocations exactly (and slows the
+    algorithms down noticeably); mode="rss" samples the process RSS from a
+    background thread, which is cheap but coarser and Linux only.
+
+    For every move the profiler records the peak above the memory in use
+    when the move started and the memory still retained when it returned.
+    The garbage collector runs before and after every move, so reference
+    cycles a move leaves behind are not counted as retained and are not
+    freed in the middle of another algorithm's move. Retained memory is
+    attributed to the algorithm that allocated it, so a strategy that keeps
+    a growing tree between moves (mcts_cached) shows up with a growing
+    retained total. If ceiling_mb is set, an algorithm whose retained total
+    plus the peak of its current move goes over it is stopped (from the
+    watchdog thread when the search runs on the main thread, otherwise right
+    after the move) and MemoryCeilingExceeded is raised.
+    """
+
+    def __init__(
+        self,
+        mode: str = "tracemalloc",
+        ceiling_mb: Optional[float] = None,
+        interval: float = 0.01,
+    ):
+        if mode not in ("tracemalloc", "rss"):
+            raise ValueError(f"Unknown memory profiling mode: {mode}")
+        if mode == "rss":
+            _rss_bytes()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.mode = mode
+        self.ceiling = int(ceiling_mb * MB) if ceiling_mb else None
+        self.interval = interval
+
+        self.move_peaks: Dict[str, List[int]] = defaultdict(list)
+        self.move_retained: Dict[str, List[int]] = defaultdict(list)
+        self.game_peaks: Dict[str, List[int]] = defaultdict(list)
+        self.game_retained: Dict[str, List[int]] = defaultdict(list)
+        self.retained_total: Dict[str, int] = defaultdict(int)
+        self.forfeits: Dict[str, int] = defaultdict(int)
+        self._game_peak: Dict[str, int] = {}
+        self._game_retained: Dict[str, int] = {}
+
+        self._lock = threading.Lock()
+        self._measuring = False
+        self._algo = ""
+        self._base = 0
+        self._peak = 0
+        self._limit_hit = False
+        self._interrupt = False
+        if mode == "rss" or self.ceiling:
+            threading.Thread(target=self._watchdog, daemon=True).start()
+
+    def _current(self) -> int:
+        if self.mode == "rss":
+            return _rss_bytes()
+        return tracemalloc.get_traced_memory()[0]
+
+    def _watchdog(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._measuring:
+                    continue
+                now = self._current()
+                self._peak = max(self._peak, now)
+                used = now - self._base + self.retained_total[self._algo]
+                if self.ceiling and used > self.ceiling and not self._limit_hit:
+                    self._limit_hit = True
+                    if self._interrupt:
+                        _thread.interrupt_main()
+
+    def begin_game(self) -> None:
+        self._game_peak = {}
+        self._game_retained = {}
+
+    def end_game(self) -> None:
+        for algo, peak in self._game_peak.items():
+            self.game_peaks[algo].append(peak)
+            self.game_retained[algo].append(self._game_retained[algo])
+
+    def call(self, algo: str, func: Callable, *args):
+        """Runs func(*args) as a move of algo and records its memory use."""
+        gc.collect()
+        with self._lock:
+            self._algo = algo
+            self._base = self._current()
+            self._peak = self._base
+            self._limit_hit = False
+            self._interrupt = threading.current_thread() is threading.main_thread()
+            if self.mode == "tracemalloc":
+                tracemalloc.reset_peak()
+            self._measuring = True
+        try:
+            try:
+                result = func(*args)
+            finally:
+                with self._lock:
+                    self._measuring = False
+        except KeyboardInterrupt:
+            if self._limit_hit:
+                self.forfeits[algo] += 1
+                if self.mode == "tracemalloc":
+                    self._peak = tracemalloc.get_traced_memory()[1]
+                used = self._peak - self._base + self.retained_total[algo]
+                raise MemoryCeilingExceeded(algo, used, self.ceiling)
+            raise
+
+        if self.mode == "tracemalloc":
+            peak = tracemalloc.get_traced_memory()[1]
+        else:
+            peak = max(self._peak, self._current())
+        gc.collect()
+        current = self._current()
+        move_peak = peak - self._base
+        retained = current - self._base
+        self.move_peaks[algo].append(move_peak)
+        self.move_retained[algo].append(retained)
+        self.retained_total[algo] += retained
+        self._game_peak[algo] = max(self._game_peak.get(algo, 0), move_peak)
+        self._game_retained[algo] = self._game_retained.get(algo, 0) + retained
+
+        if self.ceiling:
+            used = move_peak + self.retained_total[algo] - retained
+            if used > self.ceiling or self._limit_hit:
+                self.forfeits[algo] += 1
+                raise MemoryCeilingExceeded(algo, used, self.ceiling)
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-algorithm statistics in MB."""
+        out: Dict[str, Any] = {"mode": self.mode}
+        if self.ceiling:
+            out["ceiling_mb"] = self.ceiling / MB
+        algos = {}
+        for algo in list(self.move_peaks) + [
+            a for a in self.forfeits if a not in self.move_peaks
+        ]:
+            algos[algo] = {
+                "moves": len(self.move_peaks[algo]),
+                "move_peak_mb": _stats(self.move_peaks[algo]),
+                "move_retained_mb": _stats(self.move_retained[algo]),
+                "game_peak_mb": _stats(self.game_peaks[algo]),
+                "game_retained_mb": _stats(self.game_retained[algo]),
+                "retained_total_mb": self.retained_total[algo] / MB,
+                "forfeits": self.forfeits[algo],
+            }
+        out["algorithms"] = algos
+        return out
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(
+        f"{'Memory (MB)':<18} {'move peak':>10} {'game peak':>10} {'retained':>10} {'forfeits':>9}"
+    )
+    for algo, s in sorted(
+        summary["algorithms"].items(), key=lambda item: -item[1]["move_peak_mb"]["max"]
+    ):
+        print(
+            f"  {algo:<16} {s['move_peak_mb']['max']:>10.2f} {s['game_peak_mb']['max']:>10.2f} "
+            f"{s['retained_total_mb']:>10.2f} {s['forfeits']:>9}"
+        )
@@ -0,0 +1,191 @@
+import time
+from collections import defaultdict
+from typing import Dict, Any, List
+
+# Per-move search statistics that are summed up and averaged per move.
+SEARCH_SUMS = (
+    "simulations",
+    "time",
+    "nodes_allocated",
+    "nodes_pruned",
+    "avg_depth",
+    "avg_rollout_length",
+    "terminal_hit_rate",
+)
+
+
+def instant_stats(**extra: Any) -> Dict[str, Any]:
+    """
+    Search statistics of a move made without searching (from an opening
+    book or a solved position), with extra keys saying where it came from.
+    """
+    stats: Dict[str, Any] = {key: 0 for key in SEARCH_SUMS}
+    stats.update(simulations_per_sec=0.0, max_depth=0)
+    stats.update(extra)
+    return stats
+
+
+def percentile(sorted_values: List[int], q: float) -> int:
+    """Nearest-rank percentile (q in [0, 100]) of an already sorted list."""
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def distribution_ms(samples_ns: List[int]) -> Dict[str, float]:
+    """count / mean / p50 / p95 / p99 / max of nanosecond samples, in ms."""
+    values = sorted(samples_ns)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) / 1e6 if values else 0.0,
+        "p50": percentile(values, 50) / 1e6,
+        "p95": percentile(values, 95) / 1e6,
+        "p99": percentile(values, 99) / 1e6,
+        "max": (values[-1] if values else 0) / 1e6,
+    }
+
+
+class MetricsRegistry:
+    """
+    Collects per-move latencies (perf_counter_ns) for play_game.
+
+    Samples are kept per algorithm and per move number (the game's
+    turn_count when the move was chosen), so tail latency can be read
+    off for every phase of the game.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter_ns()
+        self.games = 0
+        self.moves = 0
+        self.samples: Dict[str, Dict[int, List[int]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        # Running sums of the per-move search statistics reported by the
+        # search algorithms (see algorithms.control).
+        self.search: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+
+    def record_move(self, algo: str, move_number: int, elapsed_ns: int) -> None:
+        self.samples[algo][move_number].append(elapsed_ns)
+        self.moves += 1
+
+    def record_search(self, algo: str, stats: Dict[str, Any]) -> None:
+        totals = self.search[algo]
+        totals["moves"] += 1
+        for key in SEARCH_SUMS:
+            totals[key] += stats.get(key, 0)
+        totals["max_depth"] = max(totals["max_depth"], stats.get("max_depth", 0))
+        totals["max_tree_size"] = max(
+            totals["max_tree_size"], stats.get("tree_size", 0)
+        )
+        if "reused" in stats:
+            totals["reuse_moves"] += 1
+            totals["reuse_hits"] += stats["reused"]
+            totals["reused_visits"] += stats["reused_visits"]
+        if stats.get("book"):
+            totals["book_moves"] += 1
+        if stats.get("solved"):
+            totals["solved_moves"] += 1
+
+    def record_game(self) -> None:
+        self.games += 1
+
+    def export(self) -> Dict[str, Any]:
+        """Raw samples in a picklable form, e.g. to send from a worker."""
+        return {
+            "games": self.games,
+            "moves": self.moves,
+            "samples": {a: dict(by_move) for a, by_move in self.samples.items()},
+            "search": {a: dict(totals) for a, totals in self.search.items()},
+        }
+
+    def merge(self, exported: Dict[str, Any]) -> None:
+        """Adds samples produced by another registry's export()."""
+        self.games += exported["games"]
+        self.moves += exported["moves"]
+        for algo, by_move in exported["samples"].items():
+            for move_number, values in by_move.items():
+                self.samples[algo][int(move_number)].extend(values)
+        for algo, totals in exported.get("search", {}).items():
+            for key, value in totals.items():
+                if key in ("max_depth", "max_tree_size"):
+                    self.search[algo][key] = max(self.search[algo][key], value)
+                else:
+                    self.search[algo][key] += value
+
+    def summary(self) -> Dict[str, Any]:
+        wall = (time.perf_counter_ns() - self.started) / 1e9
+        latency = {}
+        for algo, by_move in self.samples.items():
+            all_samples = [v for values in by_move.values() for v in values]
+            latency[algo] = distribution_ms(all_samples)
+            latency[algo]["by_move"] = {
+                n: distribution_ms(by_move[n]) for n in sorted(by_move)
+            }
+        search = {}
+        for algo, totals in self.search.items():
+            moves = totals["moves"]
+            search[algo] = {
+                "moves": int(moves),
+                "simulations": int(totals["simulations"]),
+                "simulations_per_move": totals["simulations"] / moves,
+                "simulations_per_sec": (
+                    totals["simulations"] / totals["time"] if totals["time"] else 0.0
+                ),
+                "nodes_per_move": totals["nodes_allocated"] / moves,
+                "pruned_per_move": totals["nodes_pruned"] / moves,
+                "max_tree_size": int(totals["max_tree_size"]),
+                "max_depth": int(totals["max_depth"]),
+                "avg_depth": totals["avg_depth"] / moves,
+                "avg_rollout_length": totals["avg_rollout_length"] / moves,
+                "terminal_hit_rate": totals["terminal_hit_rate"] / moves,
+                "book_moves": int(totals["book_moves"]),
+                "book_rate": totals["book_moves"] / moves,
+                "solved_moves": int(totals["solved_moves"]),
+                "solved_rate": totals["solved_moves"] / moves,
+            }
+            if totals["reuse_moves"]:
+                search[algo]["reuse_hit_rate"] = (
+                    totals["reuse_hits"] / totals["reuse_moves"]
+                )
+                search[algo]["reused_visits_per_move"] = (
+                    totals["reused_visits"] / totals["reuse_moves"]
+                )
+        return {
+            "games": self.games,
+            "moves": self.moves,
+            "wall_time": wall,
+            "games_per_sec": self.games / wall if wall else 0.0,
+            "moves_per_sec": self.moves / wall if wall else 0.0,
+            "latency_ms": latency,
+            "search": search,
+        }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(
+        f"{summary['games']} games, {summary['moves']} moves in {summary['wall_time']:.1f}s "
+        f"({summary['games_per_sec']:.2f} games/s, {summary['moves_per_sec']:.1f} moves/s)"
+    )
+    print(f"{'Move latency (ms)':<18} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for algo, dist in sorted(
+        summary["latency_ms"].items(), key=lambda item: -item[1]["p99"]
+    ):
+        print(
+            f"  {algo:<16} {dist['p50']:>9.3f} {dist['p95']:>9.3f} {dist['p99']:>9.3f} {dist['max']:>9.3f}"
+        )
+    if summary.get("search"):
+        print(
+            f"{'Search':<18} {'sims/s':>9} {'nodes':>9} {'depth':>9} {'rollout':>9} {'reuse':>9} {'book':>9} {'solved':>9}"
+        )
+        for algo, st in summary["search"].items():
+            reuse = st.get("reuse_hit_rate")
+            reuse_text = f"{reuse:.0%}" if reuse is not None else "-"
+            depth_text = f"{st['avg_depth']:.1f}/{st['max_depth']}"
+            print(
+                f"  {algo:<16} {st['simulations_per_sec']:>9.0f} {st['nodes_per_move']:>9.0f} "
+                f"{depth_text:>9} {st['avg_rollout_length']:>9.1f} {reuse_text:>9} {st['book_rate']:>9.0%} {st['solved_rate']:>9.0%}"
+            )
@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+from algorithms import registry
+from algorithms.MCTSNode import MCTSNode
+from engine import Game
+from metrics import percentile
+from symmetry import canonical_aps
+from utils import (
+    find_all_arithmetic_progressions,
+    generate_random_subset_with_progression,
+)
+
+RESULTS_DIR = "saved_benchmarks"
+DEFAULT_GRID = [(3, 20, 100), (4, 30, 100), (5, 50, 200)]
+# Entry points of headless runs whose import time in a fresh interpreter
+# is benchmarked (the start-up cost of every tournament worker).
+STARTUP_MODULES = ["benchmark", "distributed"]
+
+
+def measure(
+    func: Callable[..., Any],
+    min_time: float,
+    min_calls: int,
+    calls_per_run: int = 1,
+    setup: Optional[Callable[[], Any]] = None,
+) -> Dict[str, float]:
+    """
+    Calls func until min_time seconds and min_calls calls have passed.
+    If one call of func performs calls_per_run operations, the latencies
+    are reported per operation. With setup, every call is func(setup()),
+    and only func is timed.
+    """
+    samples: List[int] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_calls or time.perf_counter() < deadline:
+        args = (setup(),) if setup is not None else ()
+        start = time.perf_counter_ns()
+        func(*args)
+        samples.append((time.perf_counter_ns() - start) // calls_per_run)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "calls": len(samples) * calls_per_run,
+        "ops_per_sec": len(samples) * 1e9 / total if total else float("inf"),
+        "mean_us": total / len(samples) / 1e3,
+        "p50_us": percentile(samples, 50) / 1e3,
+        "p95_us": percentile(samples, 95) / 1e3,
+        "max_us": samples[-1] / 1e3,
+    }
+
+
+def _midgame(k: int, x: int, bound: int, seed: int) -> Game:
+    """A random board after two random moves per player."""
+    random.seed(seed)
+    game = Game(k, x, 1, bound)
+    for _ in range(4):
+        game.make_move(random.choice(sorted(game.available_numbers)))
+    return game
+
+
+Case = Tuple[str, Callable[..., Any], int, Optional[Callable[[], Any]]]
+
+
+def bench_cases(k: int, x: int, bound: int, algos: List[str], seed: int) -> List[Case]:
+    """
+    (name, func, operations per call, untimed setup or None; see measure)
+    for every benchmarked hot path.
+    """
+    random.seed(seed)
+    X, forced = generate_random_subset_with_progression(k, x, 1, bound)
+    aps = find_all_arithmetic_progressions(k, X)
+    board = (X, forced, aps)
+    order = random.sample(X, len(X))
+
+    def new_game() -> Game:
+        return Game(k, x, 1, bound, board=board)
+
+    # Only the moves are timed, not building the game.
+    def play_out(game: Game):
+        for move in order:
+            if game.game_over:
+                break
+            game.make_move(move)
+
+    def moves_played() -> int:
+        game = new_game()
+        for n, move in enumerate(order, 1):
+            game.make_move(move)
+            if game.game_over:
+                return n
+        return len(order)
+
+    root = MCTSNode(X, [], [], True, k)
+
+    def expand_all():
+        node = MCTSNode(X, [], [], True, k, available_aps=root.available_aps)
+        while not node.is_fully_expanded():
+            node.expand()
+
+    game = _midgame(k, x, bound, seed)
+    position = (sorted(game.available_numbers), game.player1_moves, game.player2_moves)
+
+    cases = [
+        (
+            "find_all_arithmetic_progressions",
+            lambda: find_all_arithmetic_progressions(k, X),
+            1,
+            None,
+        ),
+        ("canonical_aps", lambda: canonical_aps(k, X), 1, None),
+        (
+            "generate_random_subset_with_progression",
+            lambda: generate_random_subset_with_progression(k, x, 1, bound),
+            1,
+            None,
+        ),
+        ("Game.make_move", play_out, moves_played(), new_game),
+        ("MCTSNode.rollout", root.rollout, 1, None),
+        ("MCTSNode.expand", expand_all, x, None),
+    ]
+    for algo in algos:
+        strat = registry[algo]
+        cases.append(
+            (
+                f"choose_move[{algo}]",
+                lambda strat=strat: strat(
+                    list(position[0]), list(position[1]), list(position[2]), k
+                ),
+                1,
+                None,
+            )
+        )
+    return cases
+
+
+def startup_case(module: str) -> Callable[[], Any]:
+    """Imports module in a fresh interpreter; fails if that pulls in pygame."""
+    code = f"import sys, {module}; sys.exit('pygame' in sys.modules)"
+    return lambda: subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def run_suite(
+    grid: List[Tuple[int, int, int]],
+    algos: List[str],
+    min_time: float = 0.5,
+    min_calls: int = 3,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    cases = [
+        (f"{name} k={k} x={x} bound={bound}", func, ops, setup)
+        for k, x, bound in grid
+        for name, func, ops, setup in bench_cases(k, x, bound, algos, seed)
+    ]
+    cases += [(f"startup[{m}]", startup_case(m), 1, None) for m in STARTUP_MODULES]
+    for key, func, ops, setup in cases:
+        random.seed(seed)
+        results[key] = measure(func, min_time, min_calls, ops, setup)
+        r = results[key]
+        print(f"{key:<60} {r['ops_per_sec']:>12.1f} ops/s {r['mean_us']:>12.1f} us/op")
+    return {
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    """
+    Prints the change of every case against the baseline.
+    Returns the cases whose ops/sec dropped by more than threshold (0.1 = 10%).
+    """
+    regressions = []
+    print(f"\n{'Case':<60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, r in current["results"].items():
+        base = baseline["results"].get(key)
+        if not base:
+            print(f"{key:<60} {'-':>12} {r['ops_per_sec']:>12.1f}      new")
+            continue
+        change = r["ops_per_sec"] / base["ops_per_sec"] - 1
+        flag = ""
+        if change < -threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(
+            f"{key:<60} {base['ops_per_sec']:>12.1f} {r['ops_per_sec']:>12.1f} {change:>+8.1%}{flag}"
+        )
+    return regressions
+
+
+def parse_grid(values: List[str]) -> List[Tuple[int, int, int]]:
+    grid = []
+    for value in values:
+        k, x, bound = (int(v) for v in value.split(","))
+        grid.append((k, x, bound))
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the engine's hot paths and compare against a baseline."
+    )
+    parser.add_argument(
+        "--grid",
+        nargs="+",
+        required=False,
+        help="Settings to benchmark as k,x,bound triples (default: 3,20,100 4,30,100 5,50,200).",
+    )
+    parser.add_argument(
+        "--algorithms",
+        nargs="+",
+        required=False,
+        help="Registered algorithms whose choose_move is benchmarked (default: all).",
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.5, help="Seconds spent on each case."
+    )
+    parser.add_argument(
+        "--min-calls", type=int, default=3, help="Minimum number of calls per case."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--baseline", required=False, help="Results JSON to compare against."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative ops/sec drop counted as a regression (default 0.10).",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        required=False,
+        help="Also write the results to this path, to be used as a future baseline.",
+    )
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid) if args.grid else DEFAULT_GRID
+    algos = args.algorithms or list(registry.keys())
+    current = run_suite(grid, algos, args.min_time, args.min_calls, args.seed)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = os.path.join(RESULTS_DIR, f"perf_{current['timestamp']}.json")
+    for path in filter(None, (out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(current, f, indent=2)
+    print(f"Results saved to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}.")
+            sys.exit(1)
+        print("No regressions.")
@@ -0,0 +1,148 @@
+import math
+from typing import Dict, Any, List, Tuple
+
+ELO_SCALE = 400 / math.log(10)
+
+
+def expected_score(elo_diff: float) -> float:
+    """Expected score of a player rated elo_diff above its opponent."""
+    return 1 / (1 + 10 ** (-elo_diff / 400))
+
+
+def elo_diff(score: float) -> float:
+    """Inverse of expected_score."""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def score_stats(wins: int, draws: int, losses: int) -> Tuple[float, float]:
+    """
+    Mean and per-game variance of the score (1 / 0.5 / 0).
+    The variance is computed with half a pseudo-game of each outcome added,
+    so one-sided results (e.g. 10-0) do not give a zero variance.
+    """
+    n = wins + draws + losses
+    mean = (wins + 0.5 * draws) / n if n else 0.5
+    w, d, l = wins + 0.5, draws + 0.5, losses + 0.5
+    m = (w + 0.5 * d) / (w + d + l)
+    var = (w * (1 - m) ** 2 + d * (0.5 - m) ** 2 + l * m**2) / (w + d + l)
+    return mean, var
+
+
+def pairing_elo(wins: int, draws: int, losses: int) -> Tuple[float, float]:
+    """Elo difference of a pairing and its 95% error bar."""
+    n = wins + draws + losses
+    mean, var = score_stats(wins, draws, losses)
+    if not n:
+        return 0.0, float("inf")
+    s = min(max(mean, 1e-3), 1 - 1e-3)
+    stderr = math.sqrt(var / n)
+    return elo_diff(mean), 1.96 * stderr * ELO_SCALE / (s * (1 - s))
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    """
+    Log-likelihood ratio of H1 (elo = elo1) against H0 (elo = elo0),
+    using the usual normal approximation of the score distribution.
+    """
+    n = wins + draws + losses
+    if not n:
+        return 0.0
+    mean, var = score_stats(wins, draws, losses)
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+
+
+def sprt_bounds(alpha: float, beta: float) -> Tuple[float, float]:
+    """(lower, upper) LLR bounds; crossing lower accepts H0, upper accepts H1."""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def compute_ratings(
+    algos: List[str], matchups: Dict[str, Dict[str, Dict[str, int]]]
+) -> Dict[str, Dict[str, float]]:
+    """
+    Bradley-Terry (Elo) ratings from the tournament matchups table, anchored
+    at a mean of 0, with 95% error bars from the Fisher information.
+    Draws count as half a win for both sides; one virtual draw is added to
+    every pairing that was played so unbeaten algorithms stay finite.
+    """
+    games: Dict[Tuple[str, str], float] = {}
+    won: Dict[str, float] = {a: 0.0 for a in algos}
+    for a in algos:
+        for b in algos:
+            if a >= b:
+                continue
+            wins_a = matchups[a][b]["wins"]
+            wins_b = matchups[b][a]["wins"]
+            draws = matchups[a][b]["draws"] + matchups[b][a]["draws"]
+            n = wins_a + wins_b + draws
+            if not n:
+                continue
+            games[(a, b)] = n + 1
+            won[a] += wins_a + 0.5 * draws + 0.5
+            won[b] += wins_b + 0.5 * draws + 0.5
+
+    strength = {a: 1.0 for a in algos}
+    for _ in range(1000):
+        new = {}
+        for a in algos:
+            denom = 0.0
+            for (p, q), n in games.items():
+                if a in (p, q):
+                    other = q if a == p else p
+                    denom += n / (strength[a] + strength[other])
+            new[a] = won[a] / denom if denom else strength[a]
+        norm = math.exp(
+            sum(math.log(v) for v in new.values() if v > 0) / max(len(new), 1)
+        )
+        new = {a: v / norm for a, v in new.items()}
+        delta = max(abs(math.log(new[a] / strength[a])) for a in algos)
+        strength = new
+        if delta < 1e-9:
+            break
+
+    ratings: Dict[str, Dict[str, float]] = {}
+    for a in algos:
+        info = 0.0
+        for (p, q), n in games.items():
+            if a in (p, q):
+                other = q if a == p else p
+                prob = strength[a] / (strength[a] + strength[other])
+                info += n * prob * (1 - prob)
+        ratings[a] = {
+            "elo": ELO_SCALE * math.log(strength[a]),
+            "error": 1.96 * ELO_SCALE / math.sqrt(info) if info else float("inf"),
+        }
+    return ratings
+
+
+def sprt_summary(
+    wins: int,
+    draws: int,
+    losses: int,
+    elo0: float,
+    elo1: float,
+    alpha: float,
+    beta: float,
+) -> Dict[str, Any]:
+    """State of one pairing's SPRT, from the first algorithm's point of view."""
+    llr = sprt_llr(wins, draws, losses, elo0, elo1)
+    lower, upper = sprt_bounds(alpha, beta)
+    elo, error = pairing_elo(wins, draws, losses)
+    if llr >= upper:
+        decision = "H1"
+    elif llr <= lower:
+        decision = "H0"
+    else:
+        decision = None
+    return {
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "llr": llr,
+        "bounds": [lower, upper],
+        "decision": decision,
+        "elo": elo,
+        "elo_error": error,
+    }
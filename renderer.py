@@ -0,0 +1,344 @@
+import math
+import weakref
+import pygame
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+
+Color = Tuple[int, int, int]
+
+BLACK: Color = (0, 0, 0)
+WHITE: Color = (255, 255, 255)
+
+# Rendered texts of every live font, most recently used last. Keyed by the
+# font object itself (weakly), so a cache goes away with its font and a new
+# font never sees another's surfaces.
+TEXT_CACHE_SIZE = 256
+_text_caches = weakref.WeakKeyDictionary()
+
+
+def render_text(
+    font: pygame.font.Font,
+    text: str,
+    color: Color,
+    outline_color: Optional[Color] = None,
+) -> pygame.Surface:
+    """
+    Rendered text, cached per (font, text, colors); each font keeps its
+    TEXT_CACHE_SIZE most recently used texts. With outline_color the text
+    gets a one pixel outline, composed once into a single surface.
+    """
+    cache = _text_caches.get(font)
+    if cache is None:
+        cache = _text_caches[font] = OrderedDict()
+    key = (text, color, outline_color)
+    surf = cache.get(key)
+    if surf is not None:
+        cache.move_to_end(key)
+        return surf
+    txt = font.render(text, True, color)
+    if outline_color is None:
+        surf = txt
+    else:
+        outline = font.render(text, True, outline_color)
+        surf = pygame.Surface(
+            (txt.get_width() + 2, txt.get_height() + 2), pygame.SRCALPHA
+        )
+        for dx in (0, 1, 2):
+            for dy in (0, 1, 2):
+                if dx != 1 or dy != 1:
+                    surf.blit(outline, (dx, dy))
+        surf.blit(txt, (1, 1))
+    cache[key] = surf
+    if len(cache) > TEXT_CACHE_SIZE:
+        cache.popitem(last=False)
+    return surf
+
+
+class BoardRenderer:
+    """
+    Draws the board of numbers through a scrollable, zoomable viewport and
+    redraws only what changed.
+
+    Cell i sits at row i // cols, column i % cols of a grid with
+    cols = ceil(sqrt(len(values))), as before. At zoom 1 the grid fills
+    area, but cells never get smaller than min_cell pixels; larger boards
+    scroll. Only the cells inside the viewport are drawn and hit-testing
+    (cell_at) is grid arithmetic, so the cost of a frame does not grow with
+    the size of the board.
+
+    The background is drawn once into a static layer, labels are rendered
+    once per cell and the disc of every colour once per zoom level, so
+    drawing a cell is two blits. set_color() and set_text() mark the
+    affected rectangles dirty and update() redraws and pushes only those to
+    the display; scrolling, zooming and invalidate() (first frame, window
+    exposed, another screen drew over the window) redraw everything.
+    """
+
+    ZOOM_STEP = 1.25
+    MAX_ZOOM = 4.0
+    SCROLL_STEP = 40
+    # Labels are left out when the discs get too small to hold them.
+    MIN_LABEL_RADIUS = 8
+
+    def __init__(
+        self,
+        screen: pygame.Surface,
+        values: List[int],
+        area: pygame.Rect,
+        font: pygame.font.Font,
+        background: Color = WHITE,
+        color: Color = BLACK,
+        border: Optional[Color] = BLACK,
+        label_color: Color = WHITE,
+        label_outline: Optional[Color] = BLACK,
+        min_cell: int = 40,
+    ):
+        self.screen = screen
+        self.values = values
+        self.colors: List[Color] = [color] * len(values)
+        self.area = pygame.Rect(area)
+        self.font = font
+        self.border = border
+        self.label_color = label_color
+        self.label_outline = label_outline
+        self.labels: Dict[int, pygame.Surface] = {}
+        self.discs: Dict[Color, pygame.Surface] = {}
+
+        self.cols = max(1, math.ceil(len(values) ** 0.5))
+        self.rows = max(1, math.ceil(len(values) / self.cols))
+        self.base_w = max(self.area.width / self.cols, min_cell)
+        self.base_h = max(self.area.height / self.rows, min_cell)
+        # Zooming out stops once the whole board fits.
+        self.min_zoom = min(
+            1.0,
+            self.area.width / (self.cols * self.base_w),
+            self.area.height / (self.rows * self.base_h),
+        )
+        self.scroll_x = 0.0
+        self.scroll_y = 0.0
+        self.drag = False
+        self._set_zoom(1.0)
+
+        self.static = pygame.Surface(screen.get_size()).convert()
+        self.static.fill(background)
+        self.texts: Dict[str, Tuple[str, pygame.Surface, pygame.Rect]] = {}
+        self.dirty: List[pygame.Rect] = []
+        self.full = True
+
+    # Layout
+
+    def _set_zoom(self, zoom: float) -> None:
+        self.zoom = min(self.MAX_ZOOM, max(self.min_zoom, zoom))
+        self.cell_w = self.base_w * self.zoom
+        self.cell_h = self.base_h * self.zoom
+        self.radius = max(1, int(min(self.cell_w, self.cell_h) / 2 * 0.8))
+        self.discs = {}
+        self._clamp()
+
+    def _clamp(self) -> None:
+        max_x = max(0.0, self.cols * self.cell_w - self.area.width)
+        max_y = max(0.0, self.rows * self.cell_h - self.area.height)
+        self.scroll_x = min(max(self.scroll_x, 0.0), max_x)
+        self.scroll_y = min(max(self.scroll_y, 0.0), max_y)
+        self.full = True
+
+    def center(self, index: int) -> Tuple[int, int]:
+        """Screen position of the centre of cell index."""
+        row, col = divmod(index, self.cols)
+        return (
+            int(self.area.x + (col + 0.5) * self.cell_w - self.scroll_x),
+            int(self.area.y + (row + 0.5) * self.cell_h - self.scroll_y),
+        )
+
+    def cell_rect(self, index: int) -> pygame.Rect:
+        # One extra pixel around the disc for antialiasing slop.
+        rect = pygame.Rect(0, 0, 2 * self.radius + 2, 2 * self.radius + 2)
+        rect.center = self.center(index)
+        return rect
+
+    def _indices_in(self, rect: pygame.Rect) -> Iterator[int]:
+        """Indices of the cells whose slots overlap rect, row by row."""
+        clip = rect.clip(self.area)
+        if not clip.width or not clip.height:
+            return
+        col0 = max(0, int((clip.left - self.area.x + self.scroll_x) // self.cell_w))
+        col1 = min(
+            self.cols - 1,
+            int((clip.right - 1 - self.area.x + self.scroll_x) // self.cell_w),
+        )
+        row0 = max(0, int((clip.top - self.area.y + self.scroll_y) // self.cell_h))
+        row1 = min(
+            self.rows - 1,
+            int((clip.bottom - 1 - self.area.y + self.scroll_y) // self.cell_h),
+        )
+        for row in range(row0, row1 + 1):
+            start = row * self.cols
+            yield from range(start + col0, min(start + col1 + 1, len(self.values)))
+
+    def cell_at(self, pos: Tuple[int, int]) -> Optional[int]:
+        """Index of the cell whose disc contains the screen position, if any."""
+        if not self.area.collidepoint(pos):
+            return None
+        col = int((pos[0] - self.area.x + self.scroll_x) // self.cell_w)
+        row = int((pos[1] - self.area.y + self.scroll_y) // self.cell_h)
+        index = row * self.cols + col
+        if col >= self.cols or index >= len(self.values):
+            return None
+        cx, cy = self.center(index)
+        if (pos[0] - cx) ** 2 + (pos[1] - cy) ** 2 > self.radius**2:
+            return None
+        return index
+
+    # Viewport
+
+    def scroll(self, dx: float, dy: float) -> None:
+        self.scroll_x += dx
+        self.scroll_y += dy
+        self._clamp()
+
+    def zoom_at(self, factor: float, pos: Optional[Tuple[int, int]] = None) -> None:
+        """Zooms by factor keeping the board point under pos in place."""
+        if pos is None or not self.area.collidepoint(pos):
+            pos = self.area.center
+        old = self.zoom
+        # Board position under pos, in units of the zoom-1 layout.
+        bx = (pos[0] - self.area.x + self.scroll_x) / old
+        by = (pos[1] - self.area.y + self.scroll_y) / old
+        self._set_zoom(old * factor)
+        self.scroll_x = bx * self.zoom - (pos[0] - self.area.x)
+        self.scroll_y = by * self.zoom - (pos[1] - self.area.y)
+        self._clamp()
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """
+        Scrolling and zooming: mouse wheel (Ctrl+wheel zooms), dragging with
+        the right or middle button, arrow keys, +/- and 0 to reset the zoom.
+        Returns True if the event was used.
+        """
+        if event.type == pygame.MOUSEWHEEL:
+            if pygame.key.get_mods() & pygame.KMOD_CTRL:
+                self.zoom_at(self.ZOOM_STEP**event.y, pygame.mouse.get_pos())
+            else:
+                self.scroll(-event.x * self.SCROLL_STEP, -event.y * self.SCROLL_STEP)
+            return True
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in (2, 3):
+            self.drag = True
+            return True
+        if event.type == pygame.MOUSEBUTTONUP and event.button in (2, 3):
+            self.drag = False
+            return True
+        if event.type == pygame.MOUSEMOTION and self.drag:
+            self.scroll(-event.rel[0], -event.rel[1])
+            return True
+        if event.type == pygame.KEYDOWN:
+            step = self.SCROLL_STEP
+            moves = {
+                pygame.K_LEFT: (-step, 0),
+                pygame.K_RIGHT: (step, 0),
+                pygame.K_UP: (0, -step),
+                pygame.K_DOWN: (0, step),
+            }
+            if event.key in moves:
+                self.scroll(*moves[event.key])
+            elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom_at(self.ZOOM_STEP)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom_at(1 / self.ZOOM_STEP)
+            elif event.key in (pygame.K_0, pygame.K_KP0):
+                self.zoom_at(1 / self.zoom)
+            else:
+                return False
+            return True
+        return False
+
+    # Drawing
+
+    def invalidate(self) -> None:
+        self.full = True
+
+    def set_color(self, index: int, color: Color) -> None:
+        if self.colors[index] != color:
+            self.colors[index] = color
+            rect = self.cell_rect(index)
+            if rect.colliderect(self.area):
+                self.dirty.append(rect)
+
+    def set_text(
+        self,
+        key: str,
+        text: Optional[str],
+        font: pygame.font.Font,
+        color: Color = BLACK,
+        **anchor: Any,
+    ) -> None:
+        """
+        Shows text placed like surface.get_rect(**anchor), replacing the text
+        shown under key before; None removes it. The text is only rendered
+        again, and its area redrawn, when it changed.
+        """
+        old = self.texts.get(key)
+        if old is not None and old[0] == text:
+            return
+        if old is not None:
+            self.dirty.append(old[2])
+            del self.texts[key]
+        if text is not None:
+            surf = font.render(text, True, color)
+            rect = surf.get_rect(**anchor)
+            self.texts[key] = (text, surf, rect)
+            self.dirty.append(rect)
+
+    def _disc(self, color: Color) -> pygame.Surface:
+        disc = self.discs.get(color)
+        if disc is None:
+            size = 2 * self.radius + 2
+            disc = pygame.Surface((size, size), pygame.SRCALPHA)
+            center = (size // 2, size // 2)
+            pygame.draw.circle(disc, color, center, self.radius)
+            if self.border is not None and self.radius > 2:
+                pygame.draw.circle(disc, self.border, center, self.radius, 2)
+            self.discs[color] = disc
+        return disc
+
+    def _label(self, index: int) -> pygame.Surface:
+        label = self.labels.get(index)
+        if label is None:
+            label = render_text(
+                self.font, str(self.values[index]), self.label_color, self.label_outline
+            )
+            self.labels[index] = label
+        return label
+
+    def _draw_cells(self, rect: pygame.Rect) -> None:
+        labels = self.radius >= self.MIN_LABEL_RADIUS
+        for index in self._indices_in(rect):
+            cell = self.cell_rect(index)
+            self.screen.blit(self._disc(self.colors[index]), cell)
+            if labels:
+                label = self._label(index)
+                self.screen.blit(label, label.get_rect(center=cell.center))
+
+    def update(self) -> None:
+        if self.full:
+            self.screen.blit(self.static, (0, 0))
+            self.screen.set_clip(self.area)
+            self._draw_cells(self.area)
+            self.screen.set_clip(None)
+            for _, surf, rect in self.texts.values():
+                self.screen.blit(surf, rect)
+            pygame.display.flip()
+            self.full = False
+            self.dirty = []
+            return
+        if not self.dirty:
+            return
+        for area in self.dirty:
+            self.screen.blit(self.static, area, area)
+            self.screen.set_clip(area.clip(self.area))
+            self._draw_cells(area)
+            self.screen.set_clip(None)
+        for _, surf, rect in self.texts.values():
+            if rect.collidelist(self.dirty) != -1:
+                self.screen.blit(surf, rect)
+        pygame.display.update(self.dirty)
+        self.dirty = []
@@ -0,0 +1,90 @@
+import itertools
+from typing import Dict, Any, List, Tuple, Iterator, Optional
+
+from ratings import sprt_summary
+
+# Default SPRT: "is the first algorithm 50 Elo stronger or 50 Elo weaker?"
+DEFAULT_SPRT = {"elo0": -50.0, "elo1": 50.0, "alpha": 0.05, "beta": 0.05}
+
+
+class SPRTScheduler:
+    """
+    Adaptive match scheduler for run_tournament.
+
+    Every unordered pairing plays rounds of two games (one with each colour)
+    and keeps a running SPRT. A pairing stops as soon as its test is decided;
+    the remaining game budget keeps going to the undecided (close) pairings
+    until it is spent or every pairing is decided.
+    """
+
+    def __init__(
+        self,
+        algos: List[str],
+        budget: int,
+        sprt: Optional[Dict[str, float]] = None,
+        min_games: int = 4,
+        max_games: Optional[int] = None,
+    ):
+        self.params = {**DEFAULT_SPRT, **(sprt or {})}
+        self.budget = budget
+        self.min_games = min_games
+        self.max_games = max_games
+        self.played = 0
+        self.pairs: List[Tuple[str, str]] = list(itertools.combinations(algos, 2))
+        # Results from the point of view of the first algorithm of the pair.
+        self.scores: Dict[Tuple[str, str], Dict[str, int]] = {
+            pair: {"wins": 0, "draws": 0, "losses": 0} for pair in self.pairs
+        }
+
+    def games(self, pair: Tuple[str, str]) -> int:
+        return sum(self.scores[pair].values())
+
+    def state(self, pair: Tuple[str, str]) -> Dict[str, Any]:
+        s = self.scores[pair]
+        return sprt_summary(s["wins"], s["draws"], s["losses"], **self.params)
+
+    def is_decided(self, pair: Tuple[str, str]) -> bool:
+        n = self.games(pair)
+        if self.max_games is not None and n >= self.max_games:
+            return True
+        return n >= self.min_games and self.state(pair)["decision"] is not None
+
+    def __iter__(self) -> Iterator[Tuple[str, str, int]]:
+        """Yields (first_player, second_player, game_id) until done."""
+        while self.played < self.budget:
+            open_pairs = [p for p in self.pairs if not self.is_decided(p)]
+            if not open_pairs:
+                return
+            for a, b in open_pairs:
+                for first, second in ((a, b), (b, a)):
+                    if self.played >= self.budget:
+                        return
+                    self.played += 1
+                    yield first, second, self.games((a, b)) + 1
+
+    def update(self, algo1: str, algo2: str, winner: int) -> None:
+        """Records a finished game (winner as returned by play_game)."""
+        if (algo1, algo2) in self.scores:
+            pair, first_won = (algo1, algo2), winner == 1
+        else:
+            pair, first_won = (algo2, algo1), winner == 2
+        if winner == 0:
+            self.scores[pair]["draws"] += 1
+        elif first_won:
+            self.scores[pair]["wins"] += 1
+        else:
+            self.scores[pair]["losses"] += 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for pair in self.pairs:
+            state = self.state(pair)
+            state["games"] = self.games(pair)
+            if state["decision"] == "H1":
+                state["stronger"] = pair[0]
+            elif state["decision"] == "H0":
+                state["stronger"] = pair[1]
+            else:
+                state["stronger"] = None
+            out[f"{pair[0]} vs {pair[1]}"] = state
+        return out
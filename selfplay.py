@@ -0,0 +1,372 @@
+import os
+import json
+import time
+import random
+import argparse
+import multiprocessing
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Iterator
+
+import numpy as np
+
+from engine import Game
+from corpus import Board, load_corpus
+from benchmark import play_game
+
+SELFPLAY_DIR = "selfplay"
+MANIFEST = "manifest.json"
+
+
+def fields(k: int, x: int) -> Dict[str, Tuple[str, Tuple[int, ...]]]:
+    """
+    Layout of one position: field -> (dtype, shape). Board columns are the
+    board's numbers in increasing order, and everything is seen from the
+    player to move ("mover").
+    """
+    return {
+        "board": ("int32", (x,)),  # the numbers
+        "owner": ("int8", (x,)),  # 1 mover, -1 opponent, 0 free
+        "ap_counts": ("int16", (2, k)),  # live APs of mover / opponent by numbers held
+        "cell_aps": (
+            "int16",
+            (2, x),
+        ),  # live APs of mover / opponent through each number
+        "policy": ("float32", (x,)),  # MCTS root visit share per column
+        "has_policy": ("bool", ()),
+        "move": ("int16", ()),  # column played
+        "player": ("int8", ()),  # 1 or 2, the mover
+        "outcome": ("float32", ()),  # 1 win, 0.5 draw, 0 loss for the mover
+    }
+
+
+class Encoder:
+    """Features of the positions of one board, in the layout of fields()."""
+
+    def __init__(self, board: Iterable[int], aps: List[List[int]], k: int):
+        self.board = np.array(sorted(board), dtype=np.int32)
+        self.k = k
+        self.column = {int(n): c for c, n in enumerate(self.board)}
+        self.aps = np.array(
+            [[self.column[n] for n in ap] for ap in aps], dtype=np.intp
+        ).reshape(len(aps), k)
+
+    def encode(
+        self, mover: Iterable[int], opponent: Iterable[int]
+    ) -> Dict[str, np.ndarray]:
+        x, k = len(self.board), self.k
+        owner = np.zeros(x, dtype=np.int8)
+        owner[[self.column[n] for n in mover]] = 1
+        owner[[self.column[n] for n in opponent]] = -1
+        in_aps = owner[self.aps]
+        held = ((in_aps == 1).sum(axis=1), (in_aps == -1).sum(axis=1))
+        ap_counts = np.zeros((2, k), dtype=np.int16)
+        cell_aps = np.zeros((2, x), dtype=np.int16)
+        for side in (0, 1):
+            # Live for a side: the other side holds none of its numbers.
+            live = held[1 - side] == 0
+            ap_counts[side] = np.bincount(
+                np.minimum(held[side][live], k - 1), minlength=k
+            )
+            cell_aps[side] = np.bincount(self.aps[live].ravel(), minlength=x)
+        return {
+            "board": self.board,
+            "owner": owner,
+            "ap_counts": ap_counts,
+            "cell_aps": cell_aps,
+        }
+
+    def policy(self, root_visits: List[List[float]]) -> np.ndarray:
+        """Visit share per column from an MCTS search's root_visits."""
+        policy = np.zeros(len(self.board), dtype=np.float32)
+        for move, visits, _ in root_visits:
+            policy[self.column[move]] = visits
+        total = policy.sum()
+        return policy / total if total else policy
+
+
+class ShardWriter:
+    """
+    Streams positions into fixed-size shards of .npy memmaps, one file per
+    field, so only the current shard's pages are held, never whole games.
+    A game's outcome is filled into its rows once it ends; a game never
+    spans two shards, since a shard is rolled over when fewer than x rows
+    (the longest possible game) are left.
+    """
+
+    def __init__(self, directory: str, prefix: str, k: int, x: int, capacity: int):
+        self.directory = directory
+        self.prefix = prefix
+        self.layout = fields(k, x)
+        self.x = x
+        self.capacity = max(capacity, x)
+        self.shards: List[Dict[str, Any]] = []
+        self.arrays: Optional[Dict[str, np.memmap]] = None
+        self.rows = self.games = self.game_start = 0
+
+    def _open(self) -> None:
+        name = f"{self.prefix}_{len(self.shards):05d}"
+        self.name = name
+        self.arrays = {
+            field: np.lib.format.open_memmap(
+                os.path.join(self.directory, f"{name}.{field}.npy"),
+                mode="w+",
+                dtype=dtype,
+                shape=(self.capacity,) + shape,
+            )
+            for field, (dtype, shape) in self.layout.items()
+        }
+        self.rows = self.games = 0
+
+    def _close_shard(self) -> None:
+        if self.arrays is None:
+            return
+        for array in self.arrays.values():
+            array.flush()
+        self.shards.append({"name": self.name, "rows": self.rows, "games": self.games})
+        self.arrays = None
+
+    def begin_game(self) -> None:
+        if self.arrays is not None and self.capacity - self.rows < self.x:
+            self._close_shard()
+        if self.arrays is None:
+            self._open()
+        self.game_start = self.rows
+
+    def add(
+        self, row: Dict[str, np.ndarray], move: int, player: int, policy=None
+    ) -> None:
+        i = self.rows
+        for field, value in row.items():
+            self.arrays[field][i] = value
+        self.arrays["move"][i] = move
+        self.arrays["player"][i] = player
+        if policy is not None:
+            self.arrays["policy"][i] = policy
+            self.arrays["has_policy"][i] = True
+        self.rows += 1
+
+    def end_game(self, winner: int) -> None:
+        """winner: 1, 2, or 0 for a draw."""
+        rows = slice(self.game_start, self.rows)
+        if winner:
+            self.arrays["outcome"][rows] = self.arrays["player"][rows] == winner
+        else:
+            self.arrays["outcome"][rows] = 0.5
+        self.games += 1
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._close_shard()
+        return self.shards
+
+
+def generate(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Plays job["games"] games of job["players"] and streams their positions
+    into shards. Returns the shard entries for the manifest.
+    """
+    random.seed(job["seed"])
+    s = job["settings"]
+    k, x = s["k"], s["x"]
+    writer = ShardWriter(job["directory"], job["prefix"], k, x, job["shard_size"])
+    boards: List[Board] = job["boards"] or [None] * job["games"]
+    a1, a2 = job["players"]
+    for board in boards:
+        game = Game(k, x, s["lower"], s["bound"], board=board)
+        encoder = Encoder(game.X, game.all_possible, k)
+        writer.begin_game()
+
+        def on_move(game: Game, move: int, stats: Dict[str, Any]) -> None:
+            player = 1 if game.player1_turn else 2
+            mover, opponent = game.player1_moves, game.player2_moves
+            if player == 2:
+                mover, opponent = opponent, mover
+            root_visits = stats.get("root_visits")
+            writer.add(
+                encoder.encode(mover, opponent),
+                encoder.column[move],
+                player,
+                encoder.policy(root_visits) if root_visits else None,
+            )
+
+        winner = play_game(game, a1, a2, on_move=on_move)[0]
+        writer.end_game(winner)
+    return writer.close()
+
+
+def run_selfplay(
+    settings: Dict[str, Any],
+    num_games: int,
+    players: Tuple[str, str] = ("mcts", "mcts"),
+    directory: str = SELFPLAY_DIR,
+    workers: Optional[int] = None,
+    shard_size: int = 65536,
+    corpus: Optional[str] = None,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Plays num_games games of players[0] (first) against players[1] on
+    workers processes, each writing its own shards into directory, and
+    adds the shards to the directory's manifest (created if missing).
+    """
+    boards = None
+    if corpus:
+        settings, boards = load_corpus(corpus)
+        num_games = len(boards)
+        print(f"Using corpus {corpus}: {num_games} boards, settings {settings}")
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    k, x = settings["k"], settings["x"]
+    manifest = {
+        "k": k,
+        "x": x,
+        "fields": {f: [d, list(s)] for f, (d, s) in fields(k, x).items()},
+        "shards": [],
+    }
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if (manifest["k"], manifest["x"]) != (k, x):
+            raise ValueError(
+                f"{directory} holds k={manifest['k']}, x={manifest['x']} positions"
+            )
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, num_games))
+    base_seed = seed if seed is not None else random.randrange(2**31)
+    run = int(time.time())
+    jobs = []
+    for w in range(workers):
+        games = range(w, num_games, workers)
+        jobs.append(
+            {
+                "settings": settings,
+                "games": len(games),
+                "boards": [boards[i] for i in games] if boards else None,
+                "players": players,
+                "directory": directory,
+                "prefix": f"{run}_{w:03d}",
+                "shard_size": shard_size,
+                "seed": base_seed + w,
+            }
+        )
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        for shards in pool.imap_unordered(generate, jobs):
+            manifest["shards"].extend(shards)
+    elapsed = time.perf_counter() - start
+    manifest["shards"].sort(key=lambda shard: shard["name"])
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    rows = sum(shard["rows"] for shard in manifest["shards"])
+    print(
+        f"{num_games} games of {players[0]} vs {players[1]} in {elapsed:.1f}s; "
+        f"{directory} now holds {rows} positions in {len(manifest['shards'])} shards"
+    )
+    return manifest
+
+
+class ShardReader:
+    """Positions of a self-play directory, read through memory maps."""
+
+    def __init__(self, directory: str = SELFPLAY_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.k = self.manifest["k"]
+        self.x = self.manifest["x"]
+        self.shards = [s for s in self.manifest["shards"] if s["rows"]]
+
+    def __len__(self) -> int:
+        return sum(shard["rows"] for shard in self.shards)
+
+    def shard(self, name: str, field: str) -> np.ndarray:
+        return np.load(
+            os.path.join(self.directory, f"{name}.{field}.npy"), mmap_mode="r"
+        )
+
+    def batches(
+        self,
+        batch_size: int = 256,
+        fields: Optional[List[str]] = None,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Mini-batches {field: array} over every position once; the last
+        batch of each shard may be smaller. With shuffle, shards and the
+        positions within each shard come in random order.
+        """
+        fields = fields or list(self.manifest["fields"])
+        rng = np.random.default_rng(seed)
+        order = (
+            rng.permutation(len(self.shards)) if shuffle else range(len(self.shards))
+        )
+        for s in order:
+            shard = self.shards[s]
+            arrays = {f: self.shard(shard["name"], f) for f in fields}
+            rows = shard["rows"]
+            index = rng.permutation(rows) if shuffle else np.arange(rows)
+            for i in range(0, rows, batch_size):
+                # Sorted indices read the memory map sequentially.
+                take = np.sort(index[i : i + batch_size])
+                yield {f: np.asarray(a[take]) for f, a in arrays.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate self-play training data as memory-mapped shards."
+    )
+    parser.add_argument(
+        "--config",
+        required=False,
+        help="Path to JSON config with k, x, lower and bound (as used by benchmark.py).",
+    )
+    parser.add_argument(
+        "--corpus",
+        required=False,
+        help="Path to a board corpus (.npz from corpus.py) to play instead of fresh boards.",
+    )
+    parser.add_argument(
+        "--games", type=int, default=100, help="Number of games to play."
+    )
+    parser.add_argument(
+        "--players",
+        nargs=2,
+        default=["mcts", "mcts"],
+        metavar=("FIRST", "SECOND"),
+        help="Algorithms playing first and second.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes (default: all CPUs).",
+    )
+    parser.add_argument(
+        "--shard-size", type=int, default=65536, help="Positions per shard."
+    )
+    parser.add_argument(
+        "--out",
+        default=SELFPLAY_DIR,
+        help=f"Output directory (default: {SELFPLAY_DIR}).",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+    args = parser.parse_args()
+
+    cfg = {"k": 4, "x": 30, "lower": 1, "bound": 100}
+    if args.config:
+        with open(args.config) as f:
+            loaded = json.load(f)
+        cfg.update({key: loaded[key] for key in cfg if key in loaded})
+
+    run_selfplay(
+        cfg,
+        args.games,
+        players=tuple(args.players),
+        directory=args.out,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        corpus=args.corpus,
+        seed=args.seed,
+    )
@@ -5,8 +5,9 @@ import sys
 import json
 import argparse
 import pygame
-import math
-from game import Game
+from engine import Game
+from symmetry import canonical_aps
+from renderer import BoardRenderer
 
 # Colors (should match your game.py constants)
 BLACK = (0, 0, 0)
@@ -35,19 +36,15 @@ def run_simulation(moves_file: str, delay: float = 1.0):
     second_algo = data.get("second_player", "Second")
     game_id = data.get("game_id", 0)
 
-    # Initialize game logic (for validation) and then override grid
+    # Game logic (for validation) on the saved grid
     k, x, lower, bound = (
         settings["k"],
         settings["x"],
         settings["lower"],
         settings["bound"],
     )
-    game = Game(k, x, lower, bound)
-    game.X = original_grid
-    game.available_numbers = set(original_grid)
-    game.player1_moves = []
-    game.player2_moves = []
-    game.winner = None
+    board = (original_grid, [], canonical_aps(k, original_grid))
+    game = Game(k, x, lower, bound, board=board)
 
     # Pygame setup
     pygame.init()
@@ -58,22 +55,21 @@ def run_simulation(moves_file: str, delay: float = 1.0):
     font = pygame.font.Font(None, 24)
     large_font = pygame.font.Font(None, 36)
 
-    # Compute grid layout
+    # Board layout; large boards scroll and zoom
     left, right, top, bottom = 20, 20, 80, 20
-    cols = int(math.ceil(x**0.5))
-    rows = int(math.ceil(x / cols))
-    cw = (WIDTH - left - right) / cols
-    ch = (HEIGHT - top - bottom) / rows
-    radius = int(min(cw, ch) / 2 * 0.8)
-
-    # Build visual cells list
-    cells = []
-    for idx, value in enumerate(original_grid):
-        row = idx // cols
-        col = idx % cols
-        cx = left + col * cw + cw / 2
-        cy = top + row * ch + ch / 2
-        cells.append({"value": value, "center": (int(cx), int(cy)), "color": BLACK})
+    board_area = pygame.Rect(left, top, WIDTH - left - right, HEIGHT - top - bottom)
+    renderer = BoardRenderer(
+        screen,
+        original_grid,
+        board_area,
+        font,
+        background=(30, 30, 30),
+        border=None,
+        label_outline=None,
+    )
+    index_of = {value: i for i, value in enumerate(original_grid)}
+    settings_text = f"Settings: k={k}, x={x}, lower={lower}, bound={bound}"
+    renderer.set_text("settings", settings_text, font, WHITE, topleft=(20, 20))
 
     # Timing control
     next_move_time = pygame.time.get_ticks() + int(delay * 1000)
@@ -86,34 +82,25 @@ def run_simulation(moves_file: str, delay: float = 1.0):
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
                 running = False
+            if ev.type == pygame.WINDOWEXPOSED:
+                renderer.invalidate()
+            renderer.handle_event(ev)
 
         # Play next move at scheduled time
         if not finished and move_idx < len(moves) and now >= next_move_time:
             move = moves[move_idx]
             # Mark in UI and apply to game logic
-            for cell in cells:
-                if cell["value"] == move and cell["color"] == BLACK:
-                    color = PLAYER_COLOR if (move_idx % 2 == 0) else COMPUTER_COLOR
-                    cell["color"] = color
-                    game.make_move(move)
-                    break
+            i = index_of.get(move)
+            if i is not None and renderer.colors[i] == BLACK:
+                color = PLAYER_COLOR if (move_idx % 2 == 0) else COMPUTER_COLOR
+                renderer.set_color(i, color)
+                game.make_move(move)
             move_idx += 1
             next_move_time += int(delay * 1000)
             if move_idx >= len(moves):
                 finished = True
                 finish_time = now + 500  # wait 0.5s before showing result
 
-        # Draw board
-        screen.fill((30, 30, 30))
-        # Render game settings at top-left
-        settings_text = f"Settings: k={k}, x={x}, lower={lower}, bound={bound}"
-        settings_surf = font.render(settings_text, True, WHITE)
-        screen.blit(settings_surf, (20, 20))
-        for cell in cells:
-            pygame.draw.circle(screen, cell["color"], cell["center"], radius)
-            txt = font.render(str(cell["value"]), True, WHITE)
-            screen.blit(txt, txt.get_rect(center=cell["center"]))
-
         # After all moves played, show result & moves lists
         if finished and now >= finish_time:
             # Determine winner text
@@ -123,21 +110,24 @@ def run_simulation(moves_file: str, delay: float = 1.0):
                 result_text = f"{second_algo} wins!"
             else:
                 result_text = "Draw!"
-            # Render result
-            result_surf = large_font.render(result_text, True, WHITE)
-            screen.blit(result_surf, result_surf.get_rect(center=(WIDTH // 2, 30)))
+            renderer.set_text(
+                "result", result_text, large_font, WHITE, center=(WIDTH // 2, 30)
+            )
 
             # Render each player's move sequence
             first_moves = moves[0::2]
             second_moves = moves[1::2]
             first_s = f"{first_algo} moves:  " + ", ".join(map(str, first_moves))
             second_s = f"{second_algo} moves: " + ", ".join(map(str, second_moves))
-            first_surf = font.render(first_s, True, MOVE_TEXT_COLOR)
-            second_surf = font.render(second_s, True, MOVE_TEXT_COLOR)
-            screen.blit(first_surf, (20, HEIGHT - 60))
-            screen.blit(second_surf, (20, HEIGHT - 30))
-
-        pygame.display.flip()
+            renderer.set_text(
+                "first", first_s, font, MOVE_TEXT_COLOR, topleft=(20, HEIGHT - 60)
+            )
+            renderer.set_text(
+                "second", second_s, font, MOVE_TEXT_COLOR, topleft=(20, HEIGHT - 30)
+            )
+
+        # Only the cells and texts that changed are redrawn
+        renderer.update()
         clock.tick(60)
 
     pygame.quit()
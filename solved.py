@@ -0,0 +1,223 @@
+import os
+import threading
+from typing import List, Dict, Any, Tuple, Optional
+
+from symmetry import Transform, canonicalize, canonical_hash, canonical_aps
+from metrics import instant_stats
+
+# Setting this environment variable to a database path opens the store in
+# every process that looks positions up, e.g. tournament workers.
+SOLVED_ENV = "SZEMEREDI_SOLVED"
+SOLVED_PATH = os.path.join("solved", "solved.sqlite")
+
+# Positions with at most this many numbers left are solved exactly before
+# being searched.
+SOLVE_LIMIT = 10
+
+WIN, DRAW = 1.0, 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solved (
+    hash INTEGER PRIMARY KEY,  -- symmetry.canonical_hash, as a signed 64-bit integer
+    value REAL NOT NULL,       -- 1 win, 0.5 draw, 0 loss for the player to move
+    move INTEGER               -- a best move in canonical coordinates, if known
+) WITHOUT ROWID
+"""
+
+
+class SolvedStore:
+    """
+    Exact values of positions, kept in an SQLite database on local disk.
+
+    Positions are keyed by the canonical hash of (board, numbers held by
+    the player to move, numbers held by the other player, k), so results
+    carry over to every equivalent board. The database runs in WAL mode:
+    any number of processes can read while one writes, and writers wait
+    for each other (up to timeout seconds) instead of failing.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        # Imported here: only processes that use a store pay for sqlite3.
+        import sqlite3
+
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Durable across crashes of the process, which is all a cache needs.
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+
+    @staticmethod
+    def _key(
+        available_moves: List[int],
+        current_held: List[int],
+        opponent_held: List[int],
+        k: int,
+    ) -> Tuple[int, Transform]:
+        canonical = canonicalize(
+            set(available_moves) | set(current_held) | set(opponent_held),
+            current_held,
+            opponent_held,
+        )
+        h = canonical_hash(canonical, k)
+        # SQLite integers are signed.
+        return h - (1 << 64) if h >= 1 << 63 else h, canonical.transform
+
+    def get(
+        self,
+        available_moves: List[int],
+        current_held: List[int],
+        opponent_held: List[int],
+        k: int,
+    ) -> Optional[Tuple[float, Optional[int]]]:
+        """(value, best move or None) for the player to move, if solved."""
+        key, transform = self._key(available_moves, current_held, opponent_held, k)
+        row = self.conn.execute(
+            "SELECT value, move FROM solved WHERE hash = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, move = row
+        if move is not None:
+            move = transform.invert(move)
+            if move not in available_moves:
+                move = None
+        return value, move
+
+    def put(
+        self,
+        available_moves: List[int],
+        current_held: List[int],
+        opponent_held: List[int],
+        k: int,
+        value: float,
+        move: Optional[int] = None,
+    ) -> None:
+        key, transform = self._key(available_moves, current_held, opponent_held, k)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO solved (hash, value, move) VALUES (?, ?, ?)",
+            (key, value, transform.apply(move) if move is not None else None),
+        )
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM solved").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+_path: Optional[str] = os.environ.get(SOLVED_ENV) or None
+# An SQLite connection can only be used by the thread that opened it and
+# must not be shared with forked children, so every thread of every
+# process opens its own: _local.store, opened by process _local.pid for
+# path _local.path.
+_local = threading.local()
+
+
+def use(path: Optional[str]) -> None:
+    """Makes path the store of store() and solved_move(); None turns it off.
+    Stores other threads opened are reopened on their next use."""
+    global _path
+    db = getattr(_local, "store", None)
+    if db is not None and _local.pid == os.getpid():
+        db.close()
+    _local.store = None
+    _path = path
+
+
+def store() -> Optional[SolvedStore]:
+    """The store of this thread, opened on first use; None if off."""
+    if _path is None:
+        return None
+    db = getattr(_local, "store", None)
+    if db is None or _local.pid != os.getpid() or _local.path != _path:
+        db = _local.store = SolvedStore(_path)
+        _local.pid, _local.path = os.getpid(), _path
+    return db
+
+
+# Endgame solver
+
+
+def solve(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+) -> Tuple[float, Optional[int]]:
+    """
+    Exact (value, best move) for the player to move, by negamax over
+    bitmasks with a transposition table. Only feasible for a handful of
+    numbers left; see SOLVE_LIMIT.
+    """
+    numbers = sorted(set(available_moves) | set(current_held) | set(opponent_held))
+    bit = {n: 1 << i for i, n in enumerate(numbers)}
+    aps = [sum(bit[n] for n in ap) for ap in canonical_aps(k, numbers)]
+    memo: Dict[Tuple[int, int], Tuple[float, int]] = {}
+
+    def mask(values: List[int]) -> int:
+        return sum(bit[n] for n in values)
+
+    def negamax(me: int, opp: int, free: int) -> Tuple[float, int]:
+        key = (me, opp)
+        if key in memo:
+            return memo[key]
+        moves = [free & -free]
+        rest = free & (free - 1)
+        while rest:
+            moves.append(rest & -rest)
+            rest &= rest - 1
+        # A progression completed by the move wins at once.
+        for m in moves:
+            after = me | m
+            if any(ap & after == ap for ap in aps if ap & m):
+                memo[key] = (WIN, m)
+                return memo[key]
+        # With no progression left that either player can complete, it is a draw.
+        if all(ap & opp and ap & me for ap in aps):
+            memo[key] = (DRAW, moves[0])
+            return memo[key]
+        best, best_move = -1.0, moves[0]
+        for m in moves:
+            if m == free:
+                value = DRAW
+            else:
+                value = WIN - negamax(opp, me | m, free & ~m)[0]
+            if value > best:
+                best, best_move = value, m
+                if best == WIN:
+                    break
+        memo[key] = (best, best_move)
+        return memo[key]
+
+    if not available_moves:
+        return DRAW, None
+    value, m = negamax(mask(current_held), mask(opponent_held), mask(available_moves))
+    return value, numbers[m.bit_length() - 1]
+
+
+def solved_move(
+    available_moves: List[int],
+    current_held: List[int],
+    opponent_held: List[int],
+    k: int,
+    limit: int = SOLVE_LIMIT,
+) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """
+    (move, search statistics) for a solved position: looked up in the
+    store, or solved exactly and recorded if at most limit numbers are
+    left. None if the store is off or the position is neither.
+    """
+    db = store()
+    if db is None or not available_moves:
+        return None
+    found = db.get(available_moves, current_held, opponent_held, k)
+    if found is not None and found[1] is not None:
+        value, move = found
+        return move, instant_stats(solved=True, solved_value=value, solved_hit=True)
+    if len(available_moves) > limit:
+        return None
+    value, move = solve(available_moves, current_held, opponent_held, k)
+    db.put(available_moves, current_held, opponent_held, k, value, move)
+    return move, instant_stats(solved=True, solved_value=value, solved_hit=False)
@@ -0,0 +1,114 @@
+import math
+import hashlib
+from functools import lru_cache
+from typing import List, Tuple, Iterable, NamedTuple, Optional
+
+from utils import find_all_arithmetic_progressions
+
+# Arithmetic progressions are preserved by every map n -> a * n + b with
+# a != 0. Positions are therefore brought to a canonical representative by
+# translating the smallest number to 0, dividing by the gcd of the
+# differences and, if that gives a lexicographically smaller encoding,
+# reflecting (n -> max - n). Equivalent boards and positions get the same
+# canonical form and hash, so caches keyed by them are shared.
+
+
+class Transform(NamedTuple):
+    """canonical = (n - offset) // scale, or (offset - n) // scale if reflected."""
+
+    offset: int
+    scale: int
+    reflected: bool
+
+    def apply(self, n: int) -> int:
+        if self.reflected:
+            return (self.offset - n) // self.scale
+        return (n - self.offset) // self.scale
+
+    def invert(self, c: int) -> int:
+        if self.reflected:
+            return self.offset - c * self.scale
+        return self.offset + c * self.scale
+
+
+class Canonical(NamedTuple):
+    numbers: Tuple[int, ...]  # sorted
+    p1: Tuple[int, ...]  # sorted
+    p2: Tuple[int, ...]  # sorted
+    transform: Transform
+
+
+def canonicalize(
+    numbers: Iterable[int], p1: Iterable[int] = (), p2: Iterable[int] = ()
+) -> Canonical:
+    """
+    Canonical form of the board numbers with the numbers held by each
+    player (p1 and p2 keep their roles; the transform maps them along).
+    """
+    nums = sorted(set(numbers))
+    if not nums:
+        return Canonical((), (), (), Transform(0, 1, False))
+    lo, hi = nums[0], nums[-1]
+    scale = 0
+    for n in nums:
+        scale = math.gcd(scale, n - lo)
+    scale = scale or 1
+
+    held1, held2 = set(p1), set(p2)
+    candidates = []
+    for transform in (Transform(lo, scale, False), Transform(hi, scale, True)):
+        mapped = sorted(
+            (transform.apply(n), 1 if n in held1 else 2 if n in held2 else 0)
+            for n in nums
+        )
+        values = tuple(v for v, _ in mapped)
+        labels = tuple(label for _, label in mapped)
+        candidates.append(((values, labels), transform))
+    (values, labels), transform = min(candidates, key=lambda c: c[0])
+    return Canonical(
+        values,
+        tuple(v for v, label in zip(values, labels) if label == 1),
+        tuple(v for v, label in zip(values, labels) if label == 2),
+        transform,
+    )
+
+
+def canonical_hash(canonical: Canonical, k: Optional[int] = None) -> int:
+    """Stable 64-bit hash of a canonical form (the same across runs and machines)."""
+    data = "|".join(
+        [
+            str(k) if k is not None else "",
+            ",".join(map(str, canonical.numbers)),
+            ",".join(map(str, canonical.p1)),
+            ",".join(map(str, canonical.p2)),
+        ]
+    ).encode("ascii")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def position_hash(
+    numbers: Iterable[int],
+    p1: Iterable[int] = (),
+    p2: Iterable[int] = (),
+    k: Optional[int] = None,
+) -> int:
+    """Hash shared by all positions equivalent to (numbers, p1, p2)."""
+    return canonical_hash(canonicalize(numbers, p1, p2), k)
+
+
+@lru_cache(maxsize=256)
+def _canonical_aps(k: int, numbers: Tuple[int, ...]) -> Tuple[Tuple[int, ...], ...]:
+    return tuple(tuple(ap) for ap in find_all_arithmetic_progressions(k, numbers))
+
+
+def canonical_aps(k: int, numbers: Iterable[int]) -> List[List[int]]:
+    """
+    find_all_arithmetic_progressions(k, numbers), with the enumeration
+    cached by canonical form: every board equivalent to one seen recently
+    (in particular the same board, move after move) is a cache hit.
+    """
+    canonical = canonicalize(numbers)
+    invert = canonical.transform.invert
+    return sorted(
+        sorted(invert(c) for c in ap) for ap in _canonical_aps(k, canonical.numbers)
+    )
@@ -2,8 +2,8 @@ block_cipher = None
 a = Analysis(['main.py'],
              pathex=['.'],
              binaries=[],
-             datas=[('algorithms/*.py','algorithms')],
-             hiddenimports=[],
+             datas=[],
+             hiddenimports=['algorithms.algorithms', 'algorithms.potential', 'evaluator'],
              hookspath=[],
              runtime_hooks=[],
              excludes=[],
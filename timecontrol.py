@@ -0,0 +1,218 @@
+import math
+import time
+import multiprocessing
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from algorithms import registry
+from algorithms.control import SearchControl, use_control
+
+
+class TimeForfeit(Exception):
+    """Raised by play_game's time control when an overrun forfeits the game."""
+
+
+class Clock:
+    """One player's clock within a game."""
+
+    def __init__(self, control: "TimeControl"):
+        self.control = control
+        self.remaining = control.base if control.base is not None else 0.0
+        self.used = 0.0
+        self.max_move = 0.0
+        self.moves = 0
+        self.overruns = 0
+
+    def budget(self, available: int) -> Tuple[float, float]:
+        """
+        (target, hard limit) in seconds for the next move.
+        The target is what the algorithm is asked to stay within; the hard
+        limit is where the harness stops waiting for it.
+        """
+        tc = self.control
+        if tc.per_move is not None:
+            return tc.per_move, tc.per_move + tc.grace
+        moves_left = max(1, math.ceil(available / 2))
+        target = min(self.remaining, self.remaining / moves_left + tc.increment)
+        return target, self.remaining + tc.grace
+
+    def spend(self, elapsed: float, timed_out: bool) -> bool:
+        """
+        Charges a move to the clock. Returns whether it was an overrun: no
+        reply came (timed_out), or the reply came within the grace period
+        but after the move's time (per_move, or what was left on the
+        clock) had run out.
+        """
+        tc = self.control
+        allowed = tc.per_move if tc.per_move is not None else self.remaining
+        overrun = timed_out or elapsed > allowed
+        self.used += elapsed
+        self.max_move = max(self.max_move, elapsed)
+        self.moves += 1
+        self.overruns += overrun
+        if tc.per_move is None:
+            self.remaining = max(0.0, self.remaining - elapsed) + tc.increment
+        return overrun
+
+
+class TimeControl:
+    """
+    Time control for benchmark.play_game: either a fixed time per move
+    (per_move seconds) or a clock of base seconds with an increment per move.
+
+    Every algorithm runs in its own worker process, so it can be stopped
+    when it overruns. On an overrun the harness either plays a random
+    fallback move (overrun="fallback") or records a forfeit ("forfeit").
+    Clock usage per algorithm is accumulated across games for summary().
+    """
+
+    def __init__(
+        self,
+        per_move: Optional[float] = None,
+        base: Optional[float] = None,
+        increment: float = 0.0,
+        overrun: str = "fallback",
+        grace: float = 0.1,
+    ):
+        if (per_move is None) == (base is None):
+            raise ValueError(
+                "Give either per_move or base (with an optional increment)"
+            )
+        if overrun not in ("fallback", "forfeit"):
+            raise ValueError(f"Unknown overrun policy: {overrun}")
+        self.per_move = per_move
+        self.base = base
+        self.increment = increment
+        self.overrun = overrun
+        self.grace = grace
+        self.totals: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+
+    def new_clock(self) -> Clock:
+        return Clock(self)
+
+    def record(self, algo: str, clock: Clock, forfeited: bool) -> None:
+        totals = self.totals[algo]
+        totals["games"] += 1
+        totals["moves"] += clock.moves
+        totals["used"] += clock.used
+        totals["overruns"] += clock.overruns
+        totals["forfeits"] += forfeited
+        totals["max_move"] = max(totals["max_move"], clock.max_move)
+        if self.base is not None:
+            totals["remaining"] += clock.remaining
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "per_move": self.per_move,
+            "base": self.base,
+            "increment": self.increment,
+            "overrun": self.overrun,
+            "algorithms": {},
+        }
+        for algo, t in self.totals.items():
+            entry = {
+                "games": int(t["games"]),
+                "moves": int(t["moves"]),
+                "time_used": t["used"],
+                "time_per_move": t["used"] / t["moves"] if t["moves"] else 0.0,
+                "max_move": t["max_move"],
+                "overruns": int(t["overruns"]),
+                "forfeits": int(t["forfeits"]),
+            }
+            if self.base is not None:
+                entry["avg_remaining"] = t["remaining"] / t["games"]
+            out["algorithms"][algo] = entry
+        return out
+
+
+def _agent_main(conn, algo: str) -> None:
+    strat = registry.get(algo.lower(), registry["random"])
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        available, own, opp, k, budget = msg
+        control = SearchControl(deadline=time.perf_counter() + budget)
+        try:
+            with use_control(control):
+                move = strat(available, own, opp, k)
+        except Exception as e:
+            # Reported back instead of taking the worker down.
+            conn.send((None, {"error": f"{type(e).__name__}: {e}"}))
+            continue
+        conn.send((move, control.stats))
+
+
+class AgentProcess:
+    """An algorithm running in a worker process that can be stopped on overrun."""
+
+    def __init__(self, algo: str):
+        self.algo = algo
+        self.error: Optional[str] = None  # why the last choose() got no move
+        self._start()
+
+    def _start(self) -> None:
+        self.conn, child = multiprocessing.Pipe()
+        self.proc = multiprocessing.Process(
+            target=_agent_main, args=(child, self.algo), daemon=True
+        )
+        self.proc.start()
+        child.close()
+
+    def choose(
+        self,
+        available: List[int],
+        own: List[int],
+        opp: List[int],
+        k: int,
+        budget: float,
+        limit: float,
+    ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        (move, search stats), or None if no move came within limit seconds,
+        the algorithm raised or the worker died (error says which). A worker
+        that timed out or died is restarted, losing any state it kept.
+        """
+        try:
+            self.conn.send((available, own, opp, k, budget))
+            if self.conn.poll(limit):
+                move, stats = self.conn.recv()
+                if move is not None:
+                    return move, stats
+                self.error = stats["error"]
+                print(f"{self.algo} failed: {self.error}")
+                return None
+            self.error = f"no move within {limit:.3f}s"
+        except (EOFError, OSError) as e:
+            self.error = f"worker died ({type(e).__name__})"
+            print(f"{self.algo} failed: {self.error}")
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+        self._start()
+        return None
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.proc.join(timeout=1)
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.conn.close()
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(
+        f"{'Clock (s)':<18} {'per move':>9} {'max move':>9} {'overruns':>9} {'forfeits':>9}"
+    )
+    for algo, t in sorted(
+        summary["algorithms"].items(), key=lambda item: -item[1]["time_per_move"]
+    ):
+        print(
+            f"  {algo:<16} {t['time_per_move']:>9.3f} {t['max_move']:>9.3f} "
+            f"{t['overruns']:>9} {t['forfeits']:>9}"
+        )
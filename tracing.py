@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+from typing import Dict, Any, List, Optional
+
+# Setting this environment variable to a file path turns tracing on at import
+# time; a "{pid}" placeholder in the path is replaced by the process id so
+# that worker processes do not overwrite each other's traces.
+TRACE_ENV = "SZEMEREDI_TRACE"
+
+_events: Optional[List[Dict[str, Any]]] = None
+_path: Optional[str] = None
+_lock = threading.Lock()
+_save_at_exit = False  # save() is registered with atexit once
+
+
+class _Span:
+    """Context manager that records one complete ("X") trace event."""
+
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: Optional[Dict[str, Any]]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        event = {
+            "name": self.name,
+            "ph": "X",
+            "ts": self.start / 1000,
+            "dur": (end - self.start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+        }
+        if self.args:
+            event["args"] = self.args
+        events = _events
+        if events is not None:
+            with _lock:
+                events.append(event)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def is_enabled() -> bool:
+    return _events is not None
+
+
+def enable(path: str) -> None:
+    """Starts collecting spans; they are written to path by save() and at exit."""
+    global _events, _path, _save_at_exit
+    _path = path.replace("{pid}", str(os.getpid()))
+    if _events is None:
+        _events = []
+    if not _save_at_exit:
+        _save_at_exit = True
+        atexit.register(save)
+
+
+def disable() -> None:
+    """Writes the collected spans and stops tracing."""
+    global _events
+    save()
+    _events = None
+
+
+def save(path: Optional[str] = None) -> Optional[str]:
+    """Writes all spans so far as a Chrome Trace Event JSON file."""
+    path = path or _path
+    if _events is None or not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _lock:
+        events = list(_events)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def span(name: str, **args):
+    """
+    with span("name", key=value): ...
+    Costs a single check when tracing is off.
+    """
+    if _events is None:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator recording a span around every call of the function."""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return func(*args, **kwargs)
+            with _Span(span_name, None):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV])
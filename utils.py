@@ -1,5 +1,7 @@
 import random
 
+from tracing import traced
+
 
 def has_arithmetic_progression(k: int, numbers: list[int]) -> bool:
     if k <= 1:
@@ -39,6 +41,7 @@ def find_winning_progression(k: int, numbers: list[int]) -> list[int]:
     return []
 
 
+@traced()
 def find_all_arithmetic_progressions(k: int, numbers: list[int]) -> list[list[int]]:
     s = set(numbers)
     sorted_nums = sorted(s)
@@ -59,6 +62,7 @@ def find_all_arithmetic_progressions(k: int, numbers: list[int]) -> list[list[in
     return sorted(progs)
 
 
+@traced()
 def generate_random_subset_with_progression(k, subset_size, lower, bound):
     if subset_size < k or subset_size > (bound - lower + 1):
         raise ValueError("Invalid subset size")